@@ -0,0 +1,28 @@
+"""Add project archived at
+
+Revision ID: 0d8e4c6b2f73
+Revises: e5c2b7a9d431
+Create Date: 2026-10-18 23:02:37.284190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d8e4c6b2f73'
+down_revision: Union[str, Sequence[str], None] = 'e5c2b7a9d431'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('projects', sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True), schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('projects', 'archived_at', schema='app')
@@ -0,0 +1,134 @@
+"""Partition runs and findings by month
+
+Revision ID: 19161c3b3540
+Revises: 4815970f52af
+Create Date: 2026-10-18 13:40:07.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '19161c3b3540'
+down_revision: Union[str, Sequence[str], None] = '4815970f52af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# parents before children, indexes are recreated on the new tables
+TABLES = {
+    'runs': [
+        ('ix_runs_project_id_status_created_at', ['project_id', 'status', 'created_at']),
+        ('ix_runs_project_id_created_at_id', ['project_id', 'created_at', 'id']),
+        ('ix_runs_target_id', ['target_id']),
+    ],
+    'findings': [
+        ('ix_findings_run_id_severity', ['run_id', 'severity']),
+        ('ix_findings_run_id_created_at_id', ['run_id', 'created_at', 'id']),
+    ],
+}
+
+# monthly UTC partitions covering existing rows up to three months ahead, named <table>_yYYYYmMM
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    month date := date_trunc('month', coalesce((SELECT min(created_at) FROM app.{source}), now()) AT TIME ZONE 'UTC')::date;
+    last_month date := date_trunc('month', now() AT TIME ZONE 'UTC' + interval '3 months')::date;
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE app.%I PARTITION OF app.{table} FOR VALUES FROM (%L) TO (%L)',
+            '{table}_' || to_char(month, '"y"YYYY"m"MM'),
+            month::text || ' 00:00:00+00',
+            (month + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END
+$$;
+"""
+
+# runs.id is not unique on its own once partitioned, so children are removed by trigger instead of foreign key
+CASCADE_FUNCTION = """
+CREATE FUNCTION app.runs_cascade_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM app.findings WHERE run_id = OLD.id;
+    DELETE FROM app.reports WHERE run_id = OLD.id;
+    RETURN OLD;
+END
+$$;
+"""
+CASCADE_TRIGGER = "CREATE TRIGGER runs_cascade_delete AFTER DELETE ON app.runs FOR EACH ROW EXECUTE FUNCTION app.runs_cascade_delete()"
+
+# the insert side of the dropped foreign keys, the key share lock makes a concurrent delete of the run wait like it would for one
+PARENT_RUN_FUNCTION = """
+CREATE FUNCTION app.check_parent_run() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM app.runs WHERE id = NEW.run_id FOR KEY SHARE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'insert or update on table "%" violates run reference', TG_TABLE_NAME
+            USING ERRCODE = 'foreign_key_violation', DETAIL = format('Key (run_id)=(%s) is not present in table "runs".', NEW.run_id);
+    END IF;
+    RETURN NEW;
+END
+$$;
+"""
+PARENT_RUN_TRIGGERS = ('findings', 'reports')
+
+
+def create_runs_foreign_keys() -> None:
+    op.create_foreign_key('runs_project_id_fkey', 'runs', 'projects', ['project_id'], ['id'], source_schema='app', referent_schema='app', ondelete='CASCADE')
+    op.create_foreign_key('runs_target_id_fkey', 'runs', 'targets', ['target_id'], ['id'], source_schema='app', referent_schema='app', ondelete='SET NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint('findings_run_id_fkey', 'findings', schema='app', type_='foreignkey')
+    op.drop_constraint('reports_run_id_fkey', 'reports', schema='app', type_='foreignkey')
+
+    for table, indexes in TABLES.items():
+        source = f'{table}_unpartitioned'
+        op.execute(f'ALTER TABLE app.{table} RENAME TO {source}')
+        op.execute(f'CREATE TABLE app.{table} (LIKE app.{source} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+        op.execute(CREATE_PARTITIONS.format(table=table, source=source))
+        op.execute(f'INSERT INTO app.{table} SELECT * FROM app.{source}')
+        op.drop_table(source, schema='app')
+
+        # the partition key has to be part of the primary key
+        op.create_primary_key(f'{table}_pkey', table, ['id', 'created_at'], schema='app')
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False, schema='app')
+
+    create_runs_foreign_keys()
+    op.execute(CASCADE_FUNCTION)
+    op.execute(CASCADE_TRIGGER)
+    op.execute(PARENT_RUN_FUNCTION)
+    for table in PARENT_RUN_TRIGGERS:
+        op.execute(f'CREATE TRIGGER {table}_check_parent_run BEFORE INSERT OR UPDATE OF run_id ON app.{table} FOR EACH ROW EXECUTE FUNCTION app.check_parent_run()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PARENT_RUN_TRIGGERS:
+        op.execute(f'DROP TRIGGER {table}_check_parent_run ON app.{table}')
+    op.execute('DROP FUNCTION app.check_parent_run()')
+    op.execute('DROP TRIGGER runs_cascade_delete ON app.runs')
+    op.execute('DROP FUNCTION app.runs_cascade_delete()')
+
+    for table, indexes in reversed(TABLES.items()):
+        source = f'{table}_partitioned'
+        op.execute(f'ALTER TABLE app.{table} RENAME TO {source}')
+        op.execute(f'CREATE TABLE app.{table} (LIKE app.{source} INCLUDING DEFAULTS)')
+        op.execute(f'INSERT INTO app.{table} SELECT * FROM app.{source}')
+        op.drop_table(source, schema='app')
+
+        op.create_primary_key(f'{table}_pkey', table, ['id'], schema='app')
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False, schema='app')
+
+    create_runs_foreign_keys()
+    op.create_foreign_key('findings_run_id_fkey', 'findings', 'runs', ['run_id'], ['id'], source_schema='app', referent_schema='app', ondelete='CASCADE')
+    op.create_foreign_key('reports_run_id_fkey', 'reports', 'runs', ['run_id'], ['id'], source_schema='app', referent_schema='app', ondelete='CASCADE')
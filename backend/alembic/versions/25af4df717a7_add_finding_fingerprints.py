@@ -0,0 +1,60 @@
+"""Add finding fingerprints
+
+Revision ID: 25af4df717a7
+Revises: dd5a1b79db9a
+Create Date: 2026-10-18 16:21:34.112640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '25af4df717a7'
+down_revision: Union[str, Sequence[str], None] = 'dd5a1b79db9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# deleting a canonical finding frees its fingerprint, so the next occurrence becomes canonical again
+RELEASE_FUNCTION = """
+CREATE FUNCTION app.findings_release_fingerprint() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM app.finding_fingerprints WHERE finding_id = OLD.id;
+    RETURN OLD;
+END
+$$;
+"""
+RELEASE_TRIGGER = "CREATE TRIGGER findings_release_fingerprint AFTER DELETE ON app.findings FOR EACH ROW EXECUTE FUNCTION app.findings_release_fingerprint()"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('findings', sa.Column('fingerprint', sa.String(length=64), nullable=True), schema='app')
+    op.create_table('finding_fingerprints',
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('first_seen', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_seen', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('occurrences', sa.Integer(), server_default=sa.text('1'), nullable=False),
+    sa.Column('finding_id', sa.UUID(), nullable=False),
+    sa.Column('finding_created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_run_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['app.projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id', 'fingerprint'),
+    schema='app'
+    )
+    op.create_index('ix_finding_fingerprints_finding_id', 'finding_fingerprints', ['finding_id'], unique=False, schema='app')
+    op.execute(RELEASE_FUNCTION)
+    op.execute(RELEASE_TRIGGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER findings_release_fingerprint ON app.findings')
+    op.execute('DROP FUNCTION app.findings_release_fingerprint()')
+    op.drop_index('ix_finding_fingerprints_finding_id', table_name='finding_fingerprints', schema='app')
+    op.drop_table('finding_fingerprints', schema='app')
+    op.drop_column('findings', 'fingerprint', schema='app')
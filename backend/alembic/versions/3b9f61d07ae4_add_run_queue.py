@@ -0,0 +1,45 @@
+"""Add run queue
+
+Revision ID: 3b9f61d07ae4
+Revises: a47d2e9b5c18
+Create Date: 2026-10-18 21:48:20.665431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9f61d07ae4'
+down_revision: Union[str, Sequence[str], None] = 'a47d2e9b5c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RUN_PRIORITY = "CASE purpose WHEN 'PRIMARY' THEN 0 WHEN 'RETRY' THEN 1 WHEN 'SUBTASK' THEN 2 WHEN 'VALIDATION' THEN 3 WHEN 'ENRICHMENT' THEN 4 ELSE 5 END"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('runs', sa.Column('priority', sa.SmallInteger(), sa.Computed(RUN_PRIORITY, persisted=True), nullable=True), schema='app')
+    op.add_column('runs', sa.Column('attempt', sa.SmallInteger(), server_default=sa.text('1'), nullable=False), schema='app')
+    op.add_column('runs', sa.Column('lease_owner', sa.String(length=128), nullable=True), schema='app')
+    op.add_column('runs', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True), schema='app')
+    op.add_column('runs', sa.Column('last_error', sa.Text(), nullable=True), schema='app')
+    op.add_column('runs', sa.Column('retry_of', sa.UUID(), nullable=True), schema='app')
+    op.create_index('ix_runs_queue', 'runs', ['priority', 'created_at'], unique=False, schema='app', postgresql_where=sa.text("status = 'QUEUED'"))
+    op.create_index('ix_runs_lease_expires_at', 'runs', ['lease_expires_at'], unique=False, schema='app', postgresql_where=sa.text("status = 'RUNNING'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_runs_lease_expires_at', table_name='runs', schema='app', postgresql_where=sa.text("status = 'RUNNING'"))
+    op.drop_index('ix_runs_queue', table_name='runs', schema='app', postgresql_where=sa.text("status = 'QUEUED'"))
+    op.drop_column('runs', 'retry_of', schema='app')
+    op.drop_column('runs', 'last_error', schema='app')
+    op.drop_column('runs', 'lease_expires_at', schema='app')
+    op.drop_column('runs', 'lease_owner', schema='app')
+    op.drop_column('runs', 'attempt', schema='app')
+    op.drop_column('runs', 'priority', schema='app')
@@ -0,0 +1,56 @@
+"""Add foreign key and filter indexes
+
+Revision ID: 4815970f52af
+Revises: cab05be302d4
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4815970f52af'
+down_revision: Union[str, Sequence[str], None] = 'cab05be302d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns), composite indexes lead with the foreign key so they cover it as well
+INDEXES = [
+    ('ix_projects_owner_id', 'projects', ['owner_id']),
+    ('ix_targets_project_id_created_at_id', 'targets', ['project_id', 'created_at', 'id']),
+    ('ix_runs_project_id_status_created_at', 'runs', ['project_id', 'status', 'created_at']),
+    ('ix_runs_project_id_created_at_id', 'runs', ['project_id', 'created_at', 'id']),
+    ('ix_runs_target_id', 'runs', ['target_id']),
+    ('ix_findings_run_id_severity', 'findings', ['run_id', 'severity']),
+    ('ix_findings_run_id_created_at_id', 'findings', ['run_id', 'created_at', 'id']),
+    ('ix_reports_run_id', 'reports', ['run_id']),
+]
+
+# a failed concurrent build leaves an invalid index behind, which IF NOT EXISTS would take for done
+INVALID_INDEX = """
+SELECT 1 FROM pg_index
+JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace
+WHERE pg_namespace.nspname = 'app' AND pg_class.relname = :name AND NOT pg_index.indisvalid
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if op.get_bind().execute(sa.text(INVALID_INDEX), {'name': name}).first() is not None:
+                op.drop_index(name, table_name=table, schema='app', postgresql_concurrently=True)
+            op.create_index(name, table, columns, unique=False, schema='app', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, schema='app', postgresql_concurrently=True, if_exists=True)
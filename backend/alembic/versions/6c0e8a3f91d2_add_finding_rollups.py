@@ -0,0 +1,106 @@
+"""Add finding rollups
+
+Revision ID: 6c0e8a3f91d2
+Revises: 25af4df717a7
+Create Date: 2026-10-18 20:31:12.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c0e8a3f91d2'
+down_revision: Union[str, Sequence[str], None] = '25af4df717a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# statement level with transition tables, so a bulk insert or COPY touches each bucket once instead of once per row
+ROLLUP_FUNCTION = """
+CREATE FUNCTION app.findings_rollup() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE app.finding_rollups AS rollup SET count = rollup.count - removed_count.count
+        FROM (SELECT run_id, severity, finding_type, count(*) AS count FROM removed GROUP BY run_id, severity, finding_type) AS removed_count
+        WHERE rollup.run_id = removed_count.run_id AND rollup.severity = removed_count.severity AND rollup.finding_type = removed_count.finding_type;
+        DELETE FROM app.finding_rollups WHERE count <= 0 AND run_id IN (SELECT run_id FROM removed);
+    ELSE
+        INSERT INTO app.finding_rollups AS rollup (project_id, run_id, severity, finding_type, count)
+        SELECT runs.project_id, added.run_id, added.severity, added.finding_type, count(*)
+        FROM added JOIN app.runs ON runs.id = added.run_id
+        GROUP BY runs.project_id, added.run_id, added.severity, added.finding_type
+        ON CONFLICT (run_id, severity, finding_type) DO UPDATE SET count = rollup.count + excluded.count;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+# transition tables are refused on triggers with a column list, so updates are counted per row,
+# and only rows whose bucket columns changed fire, title or content edits leave the rollups alone
+ROLLUP_MOVE_FUNCTION = """
+CREATE FUNCTION app.findings_rollup_move() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE app.finding_rollups SET count = count - 1
+    WHERE run_id = OLD.run_id AND severity = OLD.severity AND finding_type = OLD.finding_type;
+    DELETE FROM app.finding_rollups
+    WHERE run_id = OLD.run_id AND severity = OLD.severity AND finding_type = OLD.finding_type AND count <= 0;
+    INSERT INTO app.finding_rollups AS rollup (project_id, run_id, severity, finding_type, count)
+    SELECT runs.project_id, NEW.run_id, NEW.severity, NEW.finding_type, 1 FROM app.runs WHERE runs.id = NEW.run_id
+    ON CONFLICT (run_id, severity, finding_type) DO UPDATE SET count = rollup.count + 1;
+    RETURN NULL;
+END
+$$;
+"""
+ROLLUP_TRIGGERS = {
+    'findings_rollup_insert': 'AFTER INSERT ON app.findings REFERENCING NEW TABLE AS added FOR EACH STATEMENT EXECUTE FUNCTION app.findings_rollup()',
+    'findings_rollup_update': (
+        'AFTER UPDATE OF run_id, severity, finding_type ON app.findings FOR EACH ROW '
+        'WHEN ((OLD.run_id, OLD.severity, OLD.finding_type) IS DISTINCT FROM (NEW.run_id, NEW.severity, NEW.finding_type)) '
+        'EXECUTE FUNCTION app.findings_rollup_move()'
+    ),
+    'findings_rollup_delete': 'AFTER DELETE ON app.findings REFERENCING OLD TABLE AS removed FOR EACH STATEMENT EXECUTE FUNCTION app.findings_rollup()',
+}
+
+BACKFILL = """
+INSERT INTO app.finding_rollups (project_id, run_id, severity, finding_type, count)
+SELECT runs.project_id, findings.run_id, findings.severity, findings.finding_type, count(*)
+FROM app.findings JOIN app.runs ON runs.id = findings.run_id
+GROUP BY runs.project_id, findings.run_id, findings.severity, findings.finding_type
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('finding_rollups',
+    sa.Column('run_id', sa.UUID(), nullable=False),
+    sa.Column('severity', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='finding_severity_enum', schema='app', create_type=False), nullable=False),
+    sa.Column('finding_type', postgresql.ENUM('VULNERABILITY', 'MISCONFIGURATION', 'CREDENTIAL', 'INFORMATION', name='finding_type_enum', schema='app', create_type=False), nullable=False),
+    sa.Column('count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['app.projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('run_id', 'severity', 'finding_type'),
+    schema='app'
+    )
+    op.create_index('ix_finding_rollups_project_id', 'finding_rollups', ['project_id'], unique=False, schema='app')
+
+    # keep findings writes out while the backfill and triggers go in, so no row is counted twice or missed
+    op.execute('LOCK TABLE app.findings IN SHARE MODE')
+    op.execute(BACKFILL)
+    op.execute(ROLLUP_FUNCTION)
+    op.execute(ROLLUP_MOVE_FUNCTION)
+    for name, definition in ROLLUP_TRIGGERS.items():
+        op.execute(f'CREATE TRIGGER {name} {definition}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in ROLLUP_TRIGGERS:
+        op.execute(f'DROP TRIGGER {name} ON app.findings')
+    op.execute('DROP FUNCTION app.findings_rollup_move()')
+    op.execute('DROP FUNCTION app.findings_rollup()')
+    op.drop_index('ix_finding_rollups_project_id', table_name='finding_rollups', schema='app')
+    op.drop_table('finding_rollups', schema='app')
@@ -0,0 +1,58 @@
+"""Add target network
+
+Revision ID: 7a1f5d3c8e26
+Revises: 0d8e4c6b2f73
+Create Date: 2026-10-18 23:41:55.602318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1f5d3c8e26'
+down_revision: Union[str, Sequence[str], None] = '0d8e4c6b2f73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# an IP or CIDR target whose value is no valid address now fails on write instead of at scan time
+TARGET_NETWORK = "CASE WHEN target_type IN ('IP', 'CIDR') THEN btrim(value)::inet END"
+
+# adding the column casts every existing row, name the offending targets instead of failing on the first one
+CHECK_TARGETS = """
+DO $$
+DECLARE
+    target record;
+    invalid text[] := '{}';
+BEGIN
+    FOR target IN SELECT id, value FROM app.targets WHERE target_type IN ('IP', 'CIDR') LOOP
+        BEGIN
+            PERFORM btrim(target.value)::inet;
+        EXCEPTION WHEN invalid_text_representation THEN
+            invalid := invalid || format('%s (%s)', target.id, target.value);
+        END;
+    END LOOP;
+    IF cardinality(invalid) > 0 THEN
+        RAISE EXCEPTION '% IP/CIDR targets hold no valid address or network: %', cardinality(invalid), array_to_string(invalid[1:20], ', ')
+            USING HINT = 'Correct their value, or change target_type of host:port and range targets, then upgrade again';
+    END IF;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CHECK_TARGETS)
+    op.add_column('targets', sa.Column('network', postgresql.INET(), sa.Computed(TARGET_NETWORK, persisted=True), nullable=True), schema='app')
+    op.create_index('ix_targets_network', 'targets', ['network'], unique=False, schema='app', postgresql_using='gist', postgresql_ops={'network': 'inet_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_targets_network', table_name='targets', schema='app', postgresql_using='gist', postgresql_ops={'network': 'inet_ops'})
+    op.drop_column('targets', 'network', schema='app')
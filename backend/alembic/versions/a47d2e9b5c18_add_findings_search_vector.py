@@ -0,0 +1,40 @@
+"""Add findings search vector
+
+Revision ID: a47d2e9b5c18
+Revises: 6c0e8a3f91d2
+Create Date: 2026-10-18 21:05:48.193027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47d2e9b5c18'
+down_revision: Union[str, Sequence[str], None] = '6c0e8a3f91d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# content and evidence are capped as a tsvector cannot exceed 1MB, long tool output would fail the insert
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', left(content, 65536)), 'B') || "
+    "setweight(to_tsvector('simple', left(evidence, 65536)), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # adding a stored generated column rewrites every partition, schedule it with the other maintenance
+    op.add_column('findings', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True), schema='app')
+    op.create_index('ix_findings_search_vector', 'findings', ['search_vector'], unique=False, schema='app', postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_findings_search_vector', table_name='findings', schema='app', postgresql_using='gin')
+    op.drop_column('findings', 'search_vector', schema='app')
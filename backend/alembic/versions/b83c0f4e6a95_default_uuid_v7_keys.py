@@ -0,0 +1,46 @@
+"""Default uuid v7 keys
+
+Revision ID: b83c0f4e6a95
+Revises: 7a1f5d3c8e26
+Create Date: 2026-10-19 00:12:40.371826
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83c0f4e6a95'
+down_revision: Union[str, Sequence[str], None] = '7a1f5d3c8e26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# insert heavy tables only, users and projects keep random keys so their ids do not reveal when they were created
+TABLES = ['targets', 'runs', 'findings', 'reports']
+
+# RFC 9562 UUIDv7: a random v4 with the first 48 bits replaced by unix milliseconds and the version nibble set to 7
+UUID_V7_FUNCTION = """
+CREATE FUNCTION app.uuid_generate_v7() RETURNS uuid LANGUAGE sql VOLATILE PARALLEL SAFE AS $$
+SELECT encode(
+    set_bit(set_bit(overlay(uuid_send(gen_random_uuid()) PLACING substring(int8send((extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3) FROM 1 FOR 6), 52, 1), 53, 1),
+    'hex'
+)::uuid
+$$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(UUID_V7_FUNCTION)
+    for table in TABLES:
+        op.alter_column(table, 'id', server_default=sa.text('app.uuid_generate_v7()'), schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'id', server_default=sa.text('gen_random_uuid()'), schema='app')
+    op.execute('DROP FUNCTION app.uuid_generate_v7()')
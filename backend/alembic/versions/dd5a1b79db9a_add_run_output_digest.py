@@ -0,0 +1,28 @@
+"""Add run output digest
+
+Revision ID: dd5a1b79db9a
+Revises: 19161c3b3540
+Create Date: 2026-10-18 15:02:55.730164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dd5a1b79db9a'
+down_revision: Union[str, Sequence[str], None] = '19161c3b3540'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('runs', sa.Column('output_digest', sa.String(length=64), nullable=True), schema='app')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('runs', 'output_digest', schema='app')
@@ -0,0 +1,104 @@
+"""Add run events
+
+Revision ID: e5c2b7a9d431
+Revises: 3b9f61d07ae4
+Create Date: 2026-10-18 22:26:03.917514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c2b7a9d431'
+down_revision: Union[str, Sequence[str], None] = '3b9f61d07ae4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# every event is journaled for resumption and its row sent as NOTIFY payload, delivered once the writer commits
+PUBLISH_FUNCTION = """
+CREATE FUNCTION app.run_events_publish(_project_id uuid, _run_id uuid, _event text, _payload jsonb) RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    journaled app.run_events;
+BEGIN
+    INSERT INTO app.run_events (project_id, run_id, event, payload) VALUES (_project_id, _run_id, _event, _payload) RETURNING * INTO journaled;
+    PERFORM pg_notify('run_events', row_to_json(journaled)::text);
+END
+$$;
+"""
+
+RUN_STATUS_FUNCTION = """
+CREATE FUNCTION app.runs_publish_status() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM app.run_events_publish(NEW.project_id, NEW.id, 'status', jsonb_build_object(
+        'status', NEW.status, 'attempt', NEW.attempt, 'error', left(NEW.last_error, 1024)
+    ));
+    RETURN NULL;
+END
+$$;
+"""
+RUN_STATUS_TRIGGERS = {
+    'runs_publish_status_insert': 'AFTER INSERT ON app.runs FOR EACH ROW',
+    'runs_publish_status_update': 'AFTER UPDATE OF status ON app.runs FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)',
+}
+
+# one event per run and statement, a bulk insert of thousands of findings stays a single notification
+FINDINGS_FUNCTION = """
+CREATE FUNCTION app.findings_publish() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    batch record;
+BEGIN
+    FOR batch IN
+        SELECT runs.project_id, added.run_id, count(*) AS count, max(added.severity) AS max_severity
+        FROM added JOIN app.runs ON runs.id = added.run_id
+        GROUP BY runs.project_id, added.run_id
+    LOOP
+        PERFORM app.run_events_publish(batch.project_id, batch.run_id, 'findings', jsonb_build_object(
+            'count', batch.count, 'max_severity', batch.max_severity
+        ));
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+"""
+FINDINGS_TRIGGER = "CREATE TRIGGER findings_publish AFTER INSERT ON app.findings REFERENCING NEW TABLE AS added FOR EACH STATEMENT EXECUTE FUNCTION app.findings_publish()"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('run_events',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('event', sa.String(length=32), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('run_id', sa.UUID(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    schema='app'
+    )
+    op.create_index('ix_run_events_project_id_id', 'run_events', ['project_id', 'id'], unique=False, schema='app')
+    op.create_index('ix_run_events_created_at', 'run_events', ['created_at'], unique=False, schema='app')
+
+    op.execute(PUBLISH_FUNCTION)
+    op.execute(RUN_STATUS_FUNCTION)
+    for name, timing in RUN_STATUS_TRIGGERS.items():
+        op.execute(f'CREATE TRIGGER {name} {timing} EXECUTE FUNCTION app.runs_publish_status()')
+    op.execute(FINDINGS_FUNCTION)
+    op.execute(FINDINGS_TRIGGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER findings_publish ON app.findings')
+    op.execute('DROP FUNCTION app.findings_publish()')
+    for name in RUN_STATUS_TRIGGERS:
+        op.execute(f'DROP TRIGGER {name} ON app.runs')
+    op.execute('DROP FUNCTION app.runs_publish_status()')
+    op.execute('DROP FUNCTION app.run_events_publish(uuid, uuid, text, jsonb)')
+    op.drop_index('ix_run_events_created_at', table_name='run_events', schema='app')
+    op.drop_index('ix_run_events_project_id_id', table_name='run_events', schema='app')
+    op.drop_table('run_events', schema='app')
@@ -0,0 +1,131 @@
+from collections.abc import Callable
+from queue import Queue, Empty, Full
+from threading import Lock, Thread, Event
+from typing import Any, Optional
+import atexit
+import logging
+
+logger = logging.getLogger("app.audit")
+
+# what emit does once capacity events are waiting: drop the new event, or wait for room
+DROP = "drop"
+BLOCK = "block"
+
+
+class AuditSink:
+    """
+    Bounded in-memory queue of audit events written in batches from a background thread.
+
+    `write` receives lists of up to batch_size events, a failing write is logged and counted
+    and its events are lost. Pending events are written when the sink closes, also at exit.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[dict[str, Any]]], Any],
+        name: str = "audit",
+        capacity: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        policy: str = DROP,
+        block_timeout: Optional[float] = None,
+    ):
+        if policy not in (DROP, BLOCK): raise ValueError(f"unknown policy {policy!r}")
+        self.write = write
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._counter_lock = Lock()
+        self._queue: Queue = Queue(capacity)
+        self._closed = Event()
+        self._writer = Thread(target=self._write_batches, name=f"{name}-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def emit(self, event: dict[str, Any]) -> bool:
+        """ Queue an event, return False when it was dropped """
+        try:
+            if self._closed.is_set(): raise Full
+            if self.policy == BLOCK:
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except Full:
+            self._count("dropped")
+            return False
+        self._count("emitted")
+        return True
+
+    def flush(self) -> None:
+        """ Wait until every event queued so far was handed to write """
+        self._queue.join()
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """ Stop accepting events and write out the pending ones """
+        if self._closed.is_set(): return
+        self._closed.set()
+        self._writer.join(timeout)
+
+    def counters(self) -> dict[str, int]:
+        with self._counter_lock:
+            return {
+                "emitted": self.emitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+            }
+
+    def render(self) -> str:
+        """ Counters in text exposition format, pass to `app.core.metrics.register` to export them """
+        lines = [
+            "# HELP audit_events_total Audit events by sink and outcome",
+            "# TYPE audit_events_total counter",
+        ]
+        counters = self.counters()
+        for outcome in ("emitted", "written", "dropped", "failed"):
+            lines.append(f'audit_events_total{{sink="{self.name}",outcome="{outcome}"}} {counters[outcome]}')
+        lines.append(f'audit_events_pending{{sink="{self.name}"}} {counters["pending"]}')
+        return "\n".join(lines) + "\n"
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _write_batches(self) -> None:
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if not batch: continue
+            try:
+                self.write(batch)
+                self._count("written", len(batch))
+            except Exception:
+                self._count("failed", len(batch))
+                logger.exception("Audit sink %s failed to write %d events", self.name, len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _take_batch(self) -> list[dict[str, Any]]:
+        """ Wait up to flush_interval for the first event, then take what else is already queued """
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,55 @@
+from statistics import median
+from argon2 import PasswordHasher
+from app.core.config import settings
+import argparse
+import time
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """ Median seconds one hash takes with the given parameters """
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("correct horse battery staple")
+        timings.append(time.perf_counter() - started)
+    return median(timings)
+
+
+def calibrate(target: float, max_memory_cost: int, parallelism: int, samples: int) -> tuple[int, int, float]:
+    """ Highest memory cost up to max_memory_cost, then highest time cost, whose hash stays within target seconds """
+    memory_cost = max_memory_cost
+    latency = measure(1, memory_cost, parallelism, samples)
+    # memory is what makes argon2 expensive to attack on GPUs, so time cost is only raised once it fits
+    while memory_cost > 8 * parallelism and latency > target:
+        memory_cost //= 2
+        latency = measure(1, memory_cost, parallelism, samples)
+
+    time_cost = 1
+    while True:
+        candidate = measure(time_cost + 1, memory_cost, parallelism, samples)
+        if candidate > target: break
+        time_cost, latency = time_cost + 1, candidate
+    return time_cost, memory_cost, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick argon2 parameters whose hash latency stays within a target on this machine")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--max-memory-mib", type=int, default=settings.PASSWORD_MEMORY_COST // 1024)
+    parser.add_argument("--parallelism", type=int, default=settings.PASSWORD_PARALLELISM)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    current = measure(settings.PASSWORD_TIME_COST, settings.PASSWORD_MEMORY_COST, settings.PASSWORD_PARALLELISM, args.samples)
+    print(f"current: {current * 1000:.0f} ms per hash")
+
+    time_cost, memory_cost, latency = calibrate(args.target_ms / 1000, args.max_memory_mib * 1024, args.parallelism, args.samples)
+    print(f"calibrated: {latency * 1000:.0f} ms per hash, at most {settings.PASSWORD_WORKERS / latency:.1f} logins/s with {settings.PASSWORD_WORKERS} workers")
+    print(f"PASSWORD_TIME_COST={time_cost}")
+    print(f"PASSWORD_MEMORY_COST={memory_cost}")
+    print(f"PASSWORD_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
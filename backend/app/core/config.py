@@ -17,6 +17,39 @@ class Settings(BaseSettings):
     DB_RUNTIME_PASSWORD: str
     DB_MIGRATE_USER: str
     DB_MIGRATE_PASSWORD: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 3600
+    DB_PROFILE: bool = False
+    DB_PROFILE_EXPLAIN: bool = False
+    DB_PROFILE_MAX_STATEMENTS: int = 1000
+    DB_SLOW_QUERY_SECONDS: float = 0.5
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 0
+    DB_RETENTION_MONTHS: int = 18
+    DB_PARTITION_MONTHS_AHEAD: int = 3
+    DB_PARTITION_CHECK_HOURS: float = 24.0
+    ARTIFACT_ROOT: Path = PROJECT_ROOT / "artifacts"
+    ARTIFACT_COMPRESSION_LEVEL: int = 3
+    ARCHIVE_ROOT: Path = PROJECT_ROOT / "archive"
+    ARCHIVE_COMPRESSION_LEVEL: int = 10
+    ARCHIVE_DELETE_CHUNK: int = 500
+    WORKER_PROCESSES: int = 2
+    WORKER_LEASE_SECONDS: float = 60.0
+    WORKER_POLL_SECONDS: float = 2.0
+    WORKER_MAX_ATTEMPTS: int = 3
+    WORKER_COMMAND_TIMEOUT: float = 3600.0
+    WORKER_COMMANDS: str = ""
+    EVENTS_HOST: str = "127.0.0.1"
+    EVENTS_PORT: int = 8001
+    EVENTS_RETENTION_HOURS: int = 24
+    PASSWORD_TIME_COST: int = 3
+    PASSWORD_MEMORY_COST: int = 65536
+    PASSWORD_PARALLELISM: int = 4
+    PASSWORD_WORKERS: int = 2
+    PASSWORD_QUEUE_LIMIT: int = 16
+    PASSWORD_TIMEOUT: float = 10.0
 
     @property
     def DB_OWNER_URL(self) -> str:
@@ -0,0 +1,93 @@
+from collections.abc import Callable, Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from threading import Lock, Thread
+from app.core.config import settings
+import bisect
+
+# bucket upper bounds in seconds for latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# every collector returns its metrics already rendered in text exposition format
+collectors: list[Callable[[], str]] = []
+
+
+class Histogram:
+    """ Thread safe cumulative histogram with fixed buckets """
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        """ Cumulative bucket counts keyed by upper bound, with sum and count """
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+    def render(self, name: str, labels: str = "") -> list[str]:
+        """ Render histogram samples, labels are given pre-formatted as `key="value",...` """
+        snapshot = self.snapshot()
+        lines = []
+        for bound, count in snapshot["buckets"].items():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {snapshot['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {snapshot['count']}")
+        return lines
+
+
+def register(collector: Callable[[], str]) -> None:
+    """ Add a collector to the text exposition """
+    collectors.append(collector)
+
+
+def render_text() -> str:
+    """ Render every registered collector in text exposition format """
+    return "".join(collector() for collector in collectors)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = render_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """ Serve `/metrics` from a daemon thread, return the server so it can be shut down """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def serve_configured(offset: int = 0) -> Optional[ThreadingHTTPServer]:
+    """ Start the metrics server on METRICS_PORT + offset unless METRICS_PORT is 0, processes of one node pass distinct offsets """
+    if not settings.METRICS_PORT: return None
+    return start_metrics_server(settings.METRICS_PORT + offset, settings.METRICS_HOST)
+
+
+
+if __name__ == "__main__":
+    pass
@@ -1,24 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+from typing import Optional
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
+from app.core.config import settings
+import multiprocessing
 
-hasher = PasswordHasher()
+# argon2 parameters new hashes are created with, stored hashes made with others are upgraded on login
+PARAMETERS = {
+    "time_cost": settings.PASSWORD_TIME_COST,
+    "memory_cost": settings.PASSWORD_MEMORY_COST,
+    "parallelism": settings.PASSWORD_PARALLELISM,
+}
+
+hasher = PasswordHasher(**PARAMETERS)
+
+
+class HasherBusy(RuntimeError):
+    """ Raised instead of queueing once PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT operations are in flight """
+
+
+@lru_cache(maxsize=None)
+def worker_hasher(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHasher:
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def hash_in_worker(parameters: tuple[int, int, int], password: str) -> str:
+    return worker_hasher(*parameters).hash(password)
+
+
+def verify_in_worker(parameters: tuple[int, int, int], password: str, hashed: str) -> bool:
+    try:
+        return worker_hasher(*parameters).verify(hashed, password)
+    except (VerifyMismatchError, InvalidHashError):
+        return False
+
+
+class HashingPool:
+    """
+    Bounded process pool running argon2 off the request threads.
+
+    Each call holds one slot until its work finished in the pool, also when the caller timed out.
+    Without a free slot the call fails with HasherBusy right away, so a login burst is rejected
+    instead of queueing behind itself.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(workers + queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("password hashing is at capacity, retry later")
+        try:
+            future = self._pool().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # the slot is held until the work is done, not until the caller stops waiting, so timed out work still counts
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None: self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawned workers, forking a process with running threads can copy held locks
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+
+pool = HashingPool(settings.PASSWORD_WORKERS, settings.PASSWORD_QUEUE_LIMIT, settings.PASSWORD_TIMEOUT)
+
+
+def parameters() -> tuple[int, int, int]:
+    return hasher.time_cost, hasher.memory_cost, hasher.parallelism
 
 
 def hash_password(password: str) -> str:
-    return hasher.hash(password)
+    return pool.run(hash_in_worker, parameters(), password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    try:
-        hasher.verify(hashed, password)
-        return True
+    return pool.run(verify_in_worker, parameters(), password, hashed)
 
-    except VerifyMismatchError:
-        return False
+
+def verify_and_upgrade(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """ Verify a password, along with a new hash to store when the stored one was made with outdated parameters """
+    if not verify_password(password, hashed): return False, None
+    if not hasher.check_needs_rehash(hashed): return True, None
+    return True, hash_password(password)
 
 
 
 if __name__ == "__main__":
     pass
-
-
@@ -0,0 +1,338 @@
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Optional, Any
+from sqlalchemy import Table, create_engine, text, pool
+from sqlalchemy.engine import Connection, Engine
+from psycopg import sql
+from app.core.config import settings
+from app.db.models import Targets, Runs, Findings, Reports, FindingFingerprints
+from app.db.partitions import PARTITIONED_TABLES, create_partition, month_of, retention_cutoff
+from app.domain.projects import ProjectStatus
+from datetime import date, datetime, timezone
+import zstandard
+import argparse
+import tempfile
+import hashlib
+import shutil
+import json
+import uuid
+
+# parents before children, rehydration loads them in this order
+ARCHIVED_TABLES: tuple[Table, ...] = tuple(model.__table__ for model in (Targets, Runs, Findings, Reports, FindingFingerprints))
+# rows of each archived table belonging to a project, as the condition on `source`
+PROJECT_ROWS = {
+    "targets": "source.project_id = {project_id}",
+    "runs": "source.project_id = {project_id}",
+    "findings": "source.run_id IN (SELECT id FROM {schema}.runs WHERE project_id = {project_id})",
+    "reports": "source.run_id IN (SELECT id FROM {schema}.runs WHERE project_id = {project_id})",
+    "finding_fingerprints": "source.project_id = {project_id}",
+}
+# column identifying a row of each archived table within one project
+ROW_KEY = {
+    "targets": "id",
+    "runs": "id",
+    "findings": "id",
+    "reports": "id",
+    "finding_fingerprints": "fingerprint",
+}
+MANIFEST = "manifest.json"
+# rows of a previous archive checked against the exported keys per round trip
+MERGE_BATCH = 1000
+
+
+def stored_columns(table: Table) -> list[str]:
+    """ Columns written by clients, generated columns are recomputed when rows are loaded again """
+    return [column.name for column in table.columns if column.computed is None]
+
+
+def archive_dir(project_id: Any) -> Path:
+    return settings.ARCHIVE_ROOT / str(uuid.UUID(str(project_id)))
+
+
+def reader_lines(reader: Any, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """ Split a decompressed stream into lines, keeping the line feed """
+    pending = b""
+    while chunk := reader.read(chunk_size):
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if pending: yield pending
+
+
+def project_status(engine: Engine, project_id: Any) -> tuple[ProjectStatus, Optional[datetime]]:
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            f'SELECT project_status, archived_at FROM "{settings.DB_SCHEMA}".projects WHERE id = :id'
+        ), {"id": project_id}).one_or_none()
+    if row is None: raise LookupError(f"Project {project_id} does not exist")
+    return ProjectStatus[row.project_status], row.archived_at
+
+
+class ArchiveFile:
+    """ Compressed JSON lines file of one table, tracking what the manifest needs to know about its rows """
+    def __init__(self, path: Path, table: Table):
+        self.table = table
+        self.digest = hashlib.sha256()
+        self.count = 0
+        self.months: set[str] = set()
+        self._file = open(path, "wb")
+        self._writer = zstandard.ZstdCompressor(level=settings.ARCHIVE_COMPRESSION_LEVEL).stream_writer(self._file)
+
+    def write(self, line: bytes, row: dict[str, Any]) -> None:
+        self.digest.update(line)
+        self._writer.write(line)
+        self.count += 1
+        if self.table.name in PARTITIONED_TABLES: self.months.add(month_of(datetime.fromisoformat(row["created_at"])).isoformat())
+
+    def close(self) -> dict[str, Any]:
+        self._writer.close()
+        self._file.close()
+        return {"rows": self.count, "sha256": self.digest.hexdigest(), "months": sorted(self.months)}
+
+
+def archived_rows(path: Path) -> Iterator[tuple[bytes, dict[str, Any]]]:
+    with open(path, "rb") as file, zstandard.ZstdDecompressor().stream_reader(file) as reader:
+        for line in reader_lines(reader):
+            yield line, json.loads(line)
+
+
+def batches(rows: Iterator[Any], size: int) -> Iterator[list[Any]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch: yield batch
+
+
+def load_keys(conn: Connection, name: str, tables: dict[str, Path]) -> None:
+    """ Stream the row keys of archive files into the temporary table name, keys are never all held in memory """
+    conn.execute(text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {name} (source text, key text, PRIMARY KEY (source, key))"))
+    conn.execute(text(f"TRUNCATE {name}"))
+    cursor = conn.connection.driver_connection.cursor()
+    for table, path in tables.items():
+        with cursor.copy(sql.SQL("COPY {} (source, key) FROM STDIN").format(sql.Identifier(name))) as copy:
+            for _, row in archived_rows(path):
+                copy.write_row((table, str(row[ROW_KEY[table]])))
+    cursor.close()
+
+
+def export_project(engine: Engine, project_id: Any, destination: Path, previous: Optional[Path] = None) -> dict[str, Any]:
+    """
+    Stream every archived table of a project into <table>.jsonl.zst files, return the manifest.
+
+    Rows of a previous archive are carried over unless exported again, the exported version is newer.
+    """
+    manifest: dict[str, Any] = {"project_id": str(project_id), "tables": {}}
+    # one snapshot for every table, so the files agree with each other
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        for table in ARCHIVED_TABLES:
+            columns = sql.SQL(", ").join(sql.Identifier(column) for column in stored_columns(table))
+            condition = sql.SQL(PROJECT_ROWS[table.name]).format(schema=sql.Identifier(table.schema), project_id=sql.Literal(str(project_id)))
+            stmt = sql.SQL("COPY (SELECT row_to_json(exported)::text FROM (SELECT {} FROM {} AS source WHERE {}) AS exported) TO STDOUT").format(
+                columns, sql.Identifier(table.schema, table.name), condition,
+            )
+
+            # exported rows go to a scratch file first, carried over rows are only known once the export is done
+            scratch = destination / f"{table.name}.export.jsonl.zst"
+            exported = ArchiveFile(scratch, table)
+            with cursor.copy(stmt) as copy:
+                for (line,) in copy.rows():
+                    exported.write(line.encode("utf-8") + b"\n", json.loads(line))
+            exported.close()
+
+            archive = ArchiveFile(destination / f"{table.name}.jsonl.zst", table)
+            if previous is not None:
+                load_keys(conn, "exported_keys", {table.name: scratch})
+                for batch in batches(archived_rows(previous / f"{table.name}.jsonl.zst"), MERGE_BATCH):
+                    exported_again = set(conn.scalars(text("SELECT key FROM exported_keys WHERE key = ANY(:keys)"), {
+                        "keys": [str(row[ROW_KEY[table.name]]) for _, row in batch],
+                    }))
+                    for line, row in batch:
+                        if str(row[ROW_KEY[table.name]]) not in exported_again: archive.write(line, row)
+            for line, row in archived_rows(scratch):
+                archive.write(line, row)
+            manifest["tables"][table.name] = archive.close()
+            scratch.unlink()
+        cursor.close()
+    return manifest
+
+
+def purge_project(engine: Engine, project_id: Any, source: Path, chunk_size: int) -> None:
+    """
+    Delete the rows of a project held by the archive at source from the tables in chunks, each chunk in its own short transaction.
+
+    Only the rows of a chunk are locked. Rows written after the export, runs that gained findings or reports
+    and targets that gained runs since stay in the tables for the next export.
+    """
+    schema = settings.DB_SCHEMA
+    with engine.connect() as conn:
+        load_keys(conn, "archived_keys", {table.name: source / f"{table.name}.jsonl.zst" for table in ARCHIVED_TABLES})
+        conn.commit()
+
+        # new findings and reports check their run with a key share lock, so none can appear for a locked run
+        # deleting a run removes its findings and reports by trigger, findings release their fingerprints and rollups
+        purge_chunks(conn, "runs", chunk_size, [
+            f'SELECT id FROM "{schema}".runs WHERE project_id = :project_id AND id = ANY(CAST(:keys AS uuid[])) FOR UPDATE',
+            f'DELETE FROM "{schema}".runs WHERE project_id = :project_id AND id = ANY(CAST(:keys AS uuid[])) '
+            f"AND NOT EXISTS (SELECT 1 FROM \"{schema}\".findings WHERE findings.run_id = runs.id "
+            f"AND NOT EXISTS (SELECT 1 FROM archived_keys WHERE source = 'findings' AND key = findings.id::text)) "
+            f"AND NOT EXISTS (SELECT 1 FROM \"{schema}\".reports WHERE reports.run_id = runs.id "
+            f"AND NOT EXISTS (SELECT 1 FROM archived_keys WHERE source = 'reports' AND key = reports.id::text))",
+        ], project_id)
+        purge_chunks(conn, "finding_fingerprints", chunk_size, [
+            f'SELECT 1 FROM "{schema}".finding_fingerprints WHERE project_id = :project_id AND fingerprint = ANY(:keys) FOR UPDATE',
+            f'DELETE FROM "{schema}".finding_fingerprints WHERE project_id = :project_id AND fingerprint = ANY(:keys) '
+            f'AND NOT EXISTS (SELECT 1 FROM "{schema}".findings WHERE findings.id = finding_fingerprints.finding_id)',
+        ], project_id)
+        # runs check their target with a key share lock too, none can start referencing a locked one
+        purge_chunks(conn, "targets", chunk_size, [
+            f'SELECT 1 FROM "{schema}".targets WHERE project_id = :project_id AND id = ANY(CAST(:keys AS uuid[])) FOR UPDATE',
+            f'DELETE FROM "{schema}".targets WHERE project_id = :project_id AND id = ANY(CAST(:keys AS uuid[])) '
+            f'AND NOT EXISTS (SELECT 1 FROM "{schema}".runs WHERE runs.target_id = targets.id)',
+        ], project_id)
+
+
+def purge_chunks(conn: Connection, table: str, chunk_size: int, statements: list[str], project_id: Any) -> None:
+    """ Run statements on the archived keys of table, chunk by chunk in their own transactions """
+    after = ""
+    while True:
+        chunk = conn.scalars(text(
+            "SELECT key FROM archived_keys WHERE source = :source AND key > :after ORDER BY key LIMIT :limit"
+        ), {"source": table, "after": after, "limit": chunk_size}).all()
+        if not chunk: break
+        # separate statements, so rows committed while the lock was awaited are seen by the delete
+        for stmt in statements:
+            conn.execute(text(stmt), {"project_id": project_id, "keys": chunk})
+        conn.commit()
+        after = chunk[-1]
+    conn.commit()
+
+
+def remaining_rows(engine: Engine, project_id: Any) -> int:
+    """ Rows of a project still in the tables, findings and reports only exist below its runs """
+    schema = settings.DB_SCHEMA
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f'SELECT (SELECT count(*) FROM "{schema}".targets WHERE project_id = :id) '
+            f'+ (SELECT count(*) FROM "{schema}".runs WHERE project_id = :id) '
+            f'+ (SELECT count(*) FROM "{schema}".finding_fingerprints WHERE project_id = :id)'
+        ), {"id": project_id}).scalar_one()
+
+
+def write_archive(engine: Engine, project_id: Any, final: Path) -> dict[str, Any]:
+    """ Export a project into a staging directory, merged with the archive already at final, then swap it in """
+    previous = final.with_name(final.name + ".previous")
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=final.parent))
+    try:
+        manifest = export_project(engine, project_id, staging, final if final.exists() else None)
+        manifest["archived_at"] = datetime.now(timezone.utc).isoformat()
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        # the archive is complete on disk before a single row is deleted, the one it replaces is kept until then
+        if final.exists(): final.rename(previous)
+        staging.rename(final)
+        if previous.exists(): shutil.rmtree(previous)
+    finally:
+        if staging.exists(): shutil.rmtree(staging)
+    return manifest
+
+
+def archive_project(engine: Engine, project_id: Any, chunk_size: int = 500, rounds: int = 3) -> dict[str, Any]:
+    """ Move the tree of an ARCHIVED project to cold storage and out of the tables, return the manifest """
+    status, archived_at = project_status(engine, project_id)
+    if status != ProjectStatus.ARCHIVED: raise ValueError(f"Refuse to archive project {project_id} which is {status.name}")
+    if archived_at is not None: raise ValueError(f"Project {project_id} is already in cold storage")
+
+    final = archive_dir(project_id)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    previous = final.with_name(final.name + ".previous")
+    # a crash between the two renames of write_archive leaves only the previous archive
+    if previous.exists() and not final.exists(): previous.rename(final)
+
+    manifest = None
+    if (final / MANIFEST).exists():
+        # an earlier run stopped while purging, the rows it deleted only exist in its archive
+        manifest = json.loads((final / MANIFEST).read_text())
+        purge_project(engine, project_id, final, chunk_size)
+
+    for _ in range(rounds):
+        if manifest is not None and not remaining_rows(engine, project_id): break
+        # rows written since the last export are merged into the archive, it is never replaced by a partial one
+        manifest = write_archive(engine, project_id, final)
+        purge_project(engine, project_id, final, chunk_size)
+    else:
+        if remaining_rows(engine, project_id): raise RuntimeError(f"Project {project_id} kept receiving writes while it was archived, run again")
+
+    with engine.begin() as conn:
+        conn.execute(text(f'UPDATE "{settings.DB_SCHEMA}".projects SET archived_at = now() WHERE id = :id'), {"id": project_id})
+    return manifest
+
+
+def rehydrate_project(engine: Engine, project_id: Any, retention_months: int = settings.DB_RETENTION_MONTHS, now: Optional[datetime] = None) -> dict[str, Any]:
+    """ Load a project tree back from cold storage with COPY in one transaction, return the manifest """
+    source = archive_dir(project_id)
+    manifest = json.loads((source / MANIFEST).read_text())
+
+    # the next retention run would drop recreated partitions of expired months again, and the rows loaded into them
+    cutoff = retention_cutoff(retention_months, now)
+    expired = sorted({month for table in PARTITIONED_TABLES for month in manifest["tables"][table]["months"] if date.fromisoformat(month) < cutoff})
+    if expired:
+        raise ValueError(
+            f"Refuse to rehydrate project {project_id}, its rows of {', '.join(expired)} are older than the "
+            f"{retention_months} months retention window and would be dropped again"
+        )
+
+    # retention may have dropped the months the archived runs and findings were created in
+    for table in PARTITIONED_TABLES:
+        for month in manifest["tables"][table]["months"]:
+            create_partition(engine, table, date.fromisoformat(month))
+
+    with engine.begin() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        for table in ARCHIVED_TABLES:
+            columns = stored_columns(table)
+            stmt = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(table.schema, table.name), sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+            )
+            digest = hashlib.sha256()
+            with cursor.copy(stmt) as copy:
+                for line, row in archived_rows(source / f"{table.name}.jsonl.zst"):
+                    digest.update(line)
+                    copy.write_row([row[column] for column in columns])
+            if digest.hexdigest() != manifest["tables"][table.name]["sha256"]:
+                raise ValueError(f"Archive of {table.name} for project {project_id} is corrupted")
+        cursor.close()
+        conn.execute(text(f'UPDATE "{settings.DB_SCHEMA}".projects SET archived_at = NULL WHERE id = :id'), {"id": project_id})
+
+    shutil.rmtree(source)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move ARCHIVED projects to cold storage or load them back")
+    parser.add_argument("action", choices=("archive", "rehydrate"))
+    parser.add_argument("project", nargs="*", help="project ids, archive defaults to every ARCHIVED project still in the tables")
+    args = parser.parse_args()
+
+    # recreating dropped partitions needs the migration role, which owns the tables
+    engine = create_engine(settings.DB_MIGRATE_URL, poolclass=pool.NullPool)
+    projects = args.project
+    if args.action == "archive" and not projects:
+        with engine.connect() as conn:
+            projects = conn.scalars(text(
+                f"SELECT id FROM \"{settings.DB_SCHEMA}\".projects WHERE project_status = 'ARCHIVED' AND archived_at IS NULL"
+            )).all()
+
+    for project_id in projects:
+        if args.action == "archive":
+            manifest = archive_project(engine, project_id, settings.ARCHIVE_DELETE_CHUNK)
+        else:
+            manifest = rehydrate_project(engine, project_id)
+        print(f"{args.action.capitalize()}d project {project_id}:", {name: table["rows"] for name, table in manifest["tables"].items()})
+
+
+if __name__ == "__main__":
+    main()
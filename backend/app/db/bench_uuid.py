@@ -0,0 +1,59 @@
+from sqlalchemy import create_engine, text, pool
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+import argparse
+import time
+
+# primary key default under test, uuid_generate_v7 is installed by the migrations
+GENERATORS = {
+    "v4": "gen_random_uuid()",
+    "v7": f"{settings.DB_SCHEMA}.uuid_generate_v7()",
+}
+
+
+def bench_inserts(engine: Engine, generator: str, rows: int, batch_size: int) -> dict[str, float]:
+    """ Insert rows in committed batches into a scratch table keyed by the generator, return throughput and index size """
+    # a regular logged table, so page splits cost the WAL they cost on the real tables
+    table = f'"{settings.DB_SCHEMA}".bench_uuid_{generator}'
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"CREATE TABLE {table} (id uuid PRIMARY KEY DEFAULT {GENERATORS[generator]}, payload text NOT NULL)"))
+
+    try:
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"INSERT INTO {table} (payload) SELECT md5(n::text) FROM generate_series(1, :count) AS n"
+                ), {"count": min(batch_size, rows - offset)})
+        elapsed = time.perf_counter() - started
+
+        with engine.connect() as conn:
+            index = conn.execute(text("SELECT pg_relation_size(to_regclass(:index))"), {
+                "index": f'"{settings.DB_SCHEMA}".bench_uuid_{generator}_pkey',
+            }).scalar_one()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+    return {"rows_per_second": rows / elapsed, "seconds": elapsed, "index_bytes": index, "index_bytes_per_row": index / rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare insert throughput and primary key index size of UUIDv4 and UUIDv7 keys")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    # scratch tables need the migration role, which may create tables in the schema
+    engine = create_engine(settings.DB_MIGRATE_URL, poolclass=pool.NullPool)
+    for generator in GENERATORS:
+        result = bench_inserts(engine, generator, args.rows, args.batch_size)
+        print(
+            f"{generator}: {result['rows_per_second']:,.0f} rows/s over {result['seconds']:.1f}s, "
+            f"primary key index {result['index_bytes'] / 2**20:.1f} MiB ({result['index_bytes_per_row']:.1f} B/row)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from collections.abc import Sequence, Iterable, AsyncIterator
+from contextlib import AbstractAsyncContextManager
+from typing import TypeVar, Optional, Any, cast
+from sqlalchemy import inspect, Column
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.sql.base import ExecutableOption
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_session, async_unit_of_work, active_async_session
+from app.db.broker.base import BrokerCore, bulk_rows, copy_columns, copy_statement, copy_values
+from datetime import datetime
+
+
+T = TypeVar("T")
+
+
+class AsyncBaseBroker(BrokerCore[T]):
+    """ Generic CRUD broker for each table entry on the async engine, executes the statements `BaseBroker` does """
+    active_session = active_async_session
+
+    def unit_of_work(self) -> AbstractAsyncContextManager[AsyncSession]:
+        """ Share one session and transaction across broker calls in `async with` code block, commit once on exit """
+        return async_unit_of_work()
+
+    async def get(self, primary_key: Any, options: Sequence[ExecutableOption] = ()) -> Optional[T]:
+        """ Retrieve entry by primary key with optional loader options, return selected entry """
+        if (entry := self._cached(primary_key, options)) is not None: return entry
+        token = self._token()
+        async with get_async_session() as session:
+            entry = await session.get(self.model, primary_key, options=options)
+        if not options: self._remember(entry, token=token)
+        return entry
+
+    async def get_by_unique(self, column: str, value: Any) -> Optional[T]:
+        """ Retrieve entry by an unique column, return selected entry """
+        if (entry := self._cached_by(column, value)) is not None: return entry
+        token = self._token()
+        results = await self.get_bulk({column: value})
+        entry = results[0] if results else None
+        self._remember(entry, column, token=token)
+        return entry
+
+    async def get_bulk(self, filters: dict[str, Any], options: Sequence[ExecutableOption] = (),
+                       since: Optional[datetime] = None, until: Optional[datetime] = None) -> Sequence[T]:
+        """ Query in bulk by custom filters in dictionary with optional loader options and creation time range, return selected entries in sequence """
+        async with get_async_session() as session:
+            return (await session.scalars(self._bulk_query(filters, options, since, until))).all()
+
+    async def stream_bulk(self, filters: dict[str, Any], batch_size: int = 1000,
+                          since: Optional[datetime] = None, until: Optional[datetime] = None) -> AsyncIterator[T]:
+        """ Query in bulk by custom filters in dictionary, yield selected entries through a server side cursor """
+        async with get_async_session() as session:
+            query = self._bulk_query(filters, since=since, until=until).execution_options(yield_per=batch_size)
+            async for entry in await session.stream_scalars(query):
+                yield entry
+
+    async def get_page(self, filters: dict[str, Any], limit: int = 50, after: Optional[tuple[datetime, Any]] = None,
+                       descending: bool = True, since: Optional[datetime] = None, until: Optional[datetime] = None) -> tuple[Sequence[T], Optional[tuple[datetime, Any]]]:
+        """ Keyset paginate by (created_at, id) with custom filters, return selected entries and cursor of next page """
+        async with get_async_session() as session:
+            entries = (await session.scalars(self._page_query(filters, limit, after, descending, since, until))).all()
+        return self._page(entries, limit)
+
+    async def create(self, data: dict[str, Any]) -> T:
+        """ Create a new entry in the table by the attributes specified in dictionary, return created entry """
+        async with get_async_session() as session:
+            return (await session.scalars(self._create_statement(data))).one()
+
+    async def create_bulk(self, entries: Iterable[dict[str, Any]]) -> list[Any]:
+        """ Create entries in bulk by the attributes specified in dictionaries, return generated primary keys in order """
+        rows = bulk_rows(entries)
+        if not rows: return []
+
+        primary_key = inspect(self.model).primary_key[0]
+        async with get_async_session() as session:
+            if self._copies(rows, primary_key):
+                return await self._copy_rows(session, rows, primary_key)
+            return list((await session.scalars(self._bulk_insert_statement(primary_key), rows)).all())
+
+    async def _copy_rows(self, session: AsyncSession, rows: list[dict[str, Any]], primary_key: Column) -> list[Any]:
+        """ Stream entries through PostgreSQL COPY, return the client side generated primary keys """
+        columns = copy_columns(self.model, rows, primary_key)
+        connection = await session.connection()
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        async with driver_connection.cursor() as cursor:
+            async with cursor.copy(copy_statement(self.model, columns)) as copy:
+                for row in rows:
+                    await copy.write_row(copy_values(row, columns))
+
+        return [row[primary_key.key] for row in rows]
+
+    async def apply(self, primary_key: Any, values: dict[str, Any]) -> Optional[T]:
+        """ Update a single entry via the provided primary key, return modified entry """
+        stmt = self._apply_statement(primary_key, values)
+        if stmt is None: return None
+        async with get_async_session() as session:
+            entry = (await session.scalars(stmt)).one_or_none()
+        self._invalidate_entry(primary_key)
+        return entry
+
+    async def apply_bulkj(self, filters: dict[str, Any], values: dict[str, Any]) -> int:
+        """ Update in bulk by custom filters in dictionary, return total updated rows count """
+        if not values: return 0
+        stmt = self._apply_bulk_statement(filters, values)
+        async with get_async_session() as session:
+            result = cast(CursorResult, await session.execute(stmt))
+        self._invalidate_model()
+        return result.rowcount or 0
+
+    async def purge(self, primary_key: Any) -> bool:
+        """ Delete entry by primary key """
+        async with get_async_session() as session:
+            entry = await session.get(self.model, primary_key)
+            if not entry: return False
+            await session.delete(entry)
+        self._invalidate_deleted(primary_key)
+        return True
+
+    async def purge_bulk(self, filters: dict[str, Any]) -> int:
+        """ Delete in bulk by custom filters in dictionary, return total deleted rows count """
+        stmt = self._purge_bulk_statement(filters)
+        async with get_async_session() as session:
+            result = cast(CursorResult, await session.execute(stmt))
+        self._invalidate_deleted()
+        return result.rowcount or 0
+
+
+if __name__ == "__main__":
+    pass
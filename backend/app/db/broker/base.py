@@ -1,60 +1,270 @@
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence, Iterable, Iterator
+from contextlib import AbstractContextManager
+from contextvars import ContextVar
 from typing import TypeVar, Generic, Type, Optional, Any, cast
-from sqlalchemy import select, delete, update
+from sqlalchemy import select, delete, update, insert, inspect, tuple_, Column, Select, Uuid, JSON
 from sqlalchemy.engine import CursorResult
-from app.db.session import get_session
+from sqlalchemy.sql.base import ExecutableOption
+from sqlalchemy.orm import Session
+from psycopg import sql
+from app.db.session import get_session, unit_of_work, active_session, after_commit
+from app.db.cache import EntityCache
+from app.db.ids import uuid7
+from datetime import datetime
+import enum
+import json
 
 
 T = TypeVar("T")
 
 
-class BaseBroker(Generic[T]):
-    """ Generic CRUD broker for each table entry """
-    def __init__(self, model: Type[T]):
+def created_between(query: Select, model: Any, since: Optional[datetime], until: Optional[datetime]) -> Select:
+    """ Restrict query to a half-open creation time range, letting PostgreSQL prune partitions of time partitioned tables """
+    if since is not None: query = query.where(model.created_at >= since)
+    if until is not None: query = query.where(model.created_at < until)
+    return query
+
+
+def returning_entries(stmt: Any, model: Any) -> Select:
+    """ ORM statement loading entries from the RETURNING of an INSERT or UPDATE, deferred columns are not returned """
+    columns = [attr.class_attribute for attr in inspect(model).column_attrs if not attr.deferred]
+    return select(model).from_statement(stmt.returning(*columns)).execution_options(populate_existing=True)
+
+
+def bulk_rows(entries: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """ Materialize entries for bulk creation, all of them must specify the same attributes """
+    rows = [dict(entry) for entry in entries]
+    if any(row.keys() != rows[0].keys() for row in rows):
+        raise ValueError("Refuse to bulk create entries with mismatching attributes")
+    return rows
+
+
+def copy_columns(model: Any, rows: list[dict[str, Any]], primary_key: Column) -> list[Column]:
+    """ Columns to COPY rows into, UUID primary keys are generated client side as COPY returns nothing """
+    if isinstance(primary_key.type, Uuid):
+        for row in rows:
+            row.setdefault(primary_key.key, uuid7())
+
+    # identity columns are always assigned by the sequence
+    mapper = inspect(model)
+    return [mapper.columns[key] for key in rows[0] if mapper.columns[key].identity is None]
+
+
+def copy_statement(model: Any, columns: list[Column]) -> sql.Composed:
+    table = model.__table__
+    names = sql.SQL(", ").join(sql.Identifier(column.name) for column in columns)
+    return sql.SQL("COPY {} ({}) FROM STDIN").format(sql.Identifier(table.schema, table.name), names)
+
+
+def copy_values(row: dict[str, Any], columns: list[Column]) -> list[Any]:
+    """ Convert a row into COPY values, native enum columns store the member name and JSON columns their encoded text """
+    values = []
+    for column in columns:
+        value = row[column.key]
+        if isinstance(value, enum.Enum): value = value.name
+        elif value is not None and isinstance(column.type, JSON): value = json.dumps(value)
+        values.append(value)
+    return values
+
+
+class BrokerCore(Generic[T]):
+    """
+    Statements and entity cache handling shared by `BaseBroker` and `AsyncBaseBroker`.
+
+    Subclasses only execute the statements built here on their engine, and name the context
+    variable holding the session of an active unit of work.
+    """
+    # bulk creation switches from multi-row INSERT to COPY at this many entries
+    copy_threshold: int = 10000
+    active_session: ContextVar = active_session
+
+    def __init__(self, model: Type[T], cache: Optional[EntityCache] = None):
         self.model = model
+        self.cache = cache
+
+    def _cached(self, primary_key: Any, options: Sequence[ExecutableOption] = ()) -> Optional[T]:
+        # cached entries carry no eagerly loaded relationships
+        if options or self.cache is None: return None
+        return self.cache.get(self.model, primary_key)
+
+    def _cached_by(self, column: str, value: Any) -> Optional[T]:
+        if self.cache is None: return None
+        return self.cache.get_by(self.model, column, value)
+
+    def _token(self) -> Optional[int]:
+        """ Cache token to take before reading, entries read before a later invalidation are not cached """
+        return self.cache.token() if self.cache is not None else None
+
+    def _bulk_query(self, filters: dict[str, Any], options: Sequence[ExecutableOption] = (),
+                    since: Optional[datetime] = None, until: Optional[datetime] = None) -> Select:
+        return created_between(select(self.model).filter_by(**filters).options(*options), self.model, since, until)
+
+    def _page_query(self, filters: dict[str, Any], limit: int, after: Optional[tuple[datetime, Any]],
+                    descending: bool, since: Optional[datetime], until: Optional[datetime]) -> Select:
+        model = cast(Any, self.model)
+        keyset = tuple_(model.created_at, model.id)
+        query = self._bulk_query(filters, since=since, until=until)
+        if after is not None:
+            query = query.where(keyset < tuple_(*after) if descending else keyset > tuple_(*after))
+        if descending:
+            query = query.order_by(model.created_at.desc(), model.id.desc())
+        else:
+            query = query.order_by(model.created_at, model.id)
+        return query.limit(limit)
+
+    @staticmethod
+    def _page(entries: Sequence[T], limit: int) -> tuple[Sequence[T], Optional[tuple[datetime, Any]]]:
+        if len(entries) < limit: return entries, None
+        last = cast(Any, entries[-1])
+        return entries, (last.created_at, last.id)
+
+    def _create_statement(self, data: dict[str, Any]) -> Select:
+        # single INSERT ... RETURNING round trip, server defaults come back with the entry
+        return returning_entries(insert(self.model).values(**data), self.model)
+
+    def _copies(self, rows: list[dict[str, Any]], primary_key: Column) -> bool:
+        """ Whether rows go through COPY, only UUID primary keys can be generated client side and returned """
+        return len(rows) >= self.copy_threshold and isinstance(primary_key.type, Uuid)
+
+    def _bulk_insert_statement(self, primary_key: Column) -> Any:
+        # batched into multi-row INSERT ... RETURNING by the insertmanyvalues feature
+        return insert(self.model).returning(primary_key, sort_by_parameter_order=True)
+
+    def _apply_statement(self, primary_key: Any, values: dict[str, Any]) -> Optional[Select]:
+        mapper = inspect(self.model)
+        values = {key: value for key, value in values.items() if key in mapper.column_attrs}
+        if not values: return None
+        # single UPDATE ... RETURNING round trip instead of select, update and refresh
+        return returning_entries(update(self.model).where(mapper.primary_key[0] == primary_key).values(**values), self.model)
+
+    def _apply_bulk_statement(self, filters: dict[str, Any], values: dict[str, Any]) -> Any:
+        if not filters: raise ValueError("Refuse to update without filters")
+        return update(self.model).filter_by(**filters).values(**values)
+
+    def _purge_bulk_statement(self, filters: dict[str, Any]) -> Any:
+        if not filters: raise ValueError("Refuse to purge without filters")
+        return delete(self.model).filter_by(**filters)
+
+    def _remember(self, entry: Optional[T], *columns: str, token: Optional[int] = None) -> None:
+        """ Populate the cache with a committed entry, skipped inside a unit of work as it may still roll back """
+        if self.cache is None or entry is None or self.active_session.get() is not None: return
+        self.cache.put(entry, *columns, token=token)
+
+    def _invalidate_entry(self, primary_key: Any) -> None:
+        self._invalidate(lambda cache: cache.invalidate(self.model, primary_key))
+
+    def _invalidate_model(self) -> None:
+        self._invalidate(lambda cache: cache.invalidate_model(self.model))
+
+    def _invalidate_deleted(self, primary_key: Any = None) -> None:
+        """ Invalidate deleted entries, all of the model unless primary_key is given, along with what cascaded from them """
+        if primary_key is None:
+            self._invalidate(lambda cache: cache.invalidate_model(self.model), lambda cache: cache.invalidate_dependents(self.model))
+        else:
+            self._invalidate(lambda cache: cache.invalidate(self.model, primary_key), lambda cache: cache.invalidate_dependents(self.model))
+
+    def _invalidate(self, *invalidations: Callable[[EntityCache], None]) -> None:
+        """ Invalidate cached entries now, and again once the surrounding unit of work committed """
+        if self.cache is None: return
+        cache = self.cache
+        def invalidate() -> None:
+            for invalidation in invalidations:
+                invalidation(cache)
+
+        invalidate()
+        # readers outside the unit of work still see the old rows until it commits, and may cache them meanwhile
+        session = self.active_session.get()
+        if session is not None: after_commit(session, invalidate)
+
+
+class BaseBroker(BrokerCore[T]):
+    """ Generic CRUD broker for each table entry """
+
+    def unit_of_work(self) -> AbstractContextManager[Session]:
+        """ Share one session and transaction across broker calls in `with` code block, commit once on exit """
+        return unit_of_work()
+
+    def get(self, primary_key: Any, options: Sequence[ExecutableOption] = ()) -> Optional[T]:
+        """ Retrieve entry by primary key with optional loader options, return selected entry """
+        if (entry := self._cached(primary_key, options)) is not None: return entry
+        token = self._token()
+        with get_session() as session:
+            entry = session.get(self.model, primary_key, options=options)
+        if not options: self._remember(entry, token=token)
+        return entry
+
+    def get_by_unique(self, column: str, value: Any) -> Optional[T]:
+        """ Retrieve entry by an unique column, return selected entry """
+        if (entry := self._cached_by(column, value)) is not None: return entry
+        token = self._token()
+        results = self.get_bulk({column: value})
+        entry = results[0] if results else None
+        self._remember(entry, column, token=token)
+        return entry
+
+    def get_bulk(self, filters: dict[str, Any], options: Sequence[ExecutableOption] = (),
+                 since: Optional[datetime] = None, until: Optional[datetime] = None) -> Sequence[T]:
+        """ Query in bulk by custom filters in dictionary with optional loader options and creation time range, return selected entries in sequence """
+        with get_session() as session:
+            return session.scalars(self._bulk_query(filters, options, since, until)).all()
 
-    def get(self, primary_key: Any) -> Optional[T]:
-        """ Retrieve entry by primary key, return selected entry """
+    def stream_bulk(self, filters: dict[str, Any], batch_size: int = 1000,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[T]:
+        """ Query in bulk by custom filters in dictionary, yield selected entries through a server side cursor """
         with get_session() as session:
-            return session.get(self.model, primary_key)
+            query = self._bulk_query(filters, since=since, until=until).execution_options(yield_per=batch_size)
+            yield from session.scalars(query)
 
-    def get_bulk(self, filters: dict[str, Any]) -> Sequence[T]:
-        """ Query in bulk by custom filters in dictionary, return selected entries in sequence """
+    def get_page(self, filters: dict[str, Any], limit: int = 50, after: Optional[tuple[datetime, Any]] = None,
+                 descending: bool = True, since: Optional[datetime] = None, until: Optional[datetime] = None) -> tuple[Sequence[T], Optional[tuple[datetime, Any]]]:
+        """ Keyset paginate by (created_at, id) with custom filters, return selected entries and cursor of next page """
         with get_session() as session:
-            query = select(self.model).filter_by(**filters)
-            return session.scalars(query).all()
+            entries = session.scalars(self._page_query(filters, limit, after, descending, since, until)).all()
+        return self._page(entries, limit)
 
     def create(self, data: dict[str, Any]) -> T:
         """ Create a new entry in the table by the attributes specified in dictionary, return created entry """
         with get_session() as session:
-            entry = self.model(**data)
-            session.add(entry)
-            session.flush()
-            session.refresh(entry)
-            return entry
+            return session.scalars(self._create_statement(data)).one()
+
+    def create_bulk(self, entries: Iterable[dict[str, Any]]) -> list[Any]:
+        """ Create entries in bulk by the attributes specified in dictionaries, return generated primary keys in order """
+        rows = bulk_rows(entries)
+        if not rows: return []
+
+        primary_key = inspect(self.model).primary_key[0]
+        with get_session() as session:
+            if self._copies(rows, primary_key):
+                return self._copy_rows(session, rows, primary_key)
+            return list(session.scalars(self._bulk_insert_statement(primary_key), rows).all())
+
+    def _copy_rows(self, session: Session, rows: list[dict[str, Any]], primary_key: Column) -> list[Any]:
+        """ Stream entries through PostgreSQL COPY, return the client side generated primary keys """
+        columns = copy_columns(self.model, rows, primary_key)
+        driver_connection = session.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor, cursor.copy(copy_statement(self.model, columns)) as copy:
+            for row in rows:
+                copy.write_row(copy_values(row, columns))
+
+        return [row[primary_key.key] for row in rows]
 
     def apply(self, primary_key: Any, values: dict[str, Any]) -> Optional[T]:
         """ Update a single entry via the provided primary key, return modified entry """
-        if not values: return None
+        stmt = self._apply_statement(primary_key, values)
+        if stmt is None: return None
         with get_session() as session:
-            entry = session.get(self.model, primary_key)
-            if not entry: return None
-            for key, value in values.items():
-                if hasattr(self.model, key):
-                    setattr(entry, key, value)
-
-            session.flush()
-            session.refresh(entry)
-            return entry
+            entry = session.scalars(stmt).one_or_none()
+        self._invalidate_entry(primary_key)
+        return entry
 
     def apply_bulkj(self, filters: dict[str, Any], values: dict[str, Any]) -> int:
         """ Update in bulk by custom filters in dictionary, return total updated rows count """
         if not values: return 0
-        if not filters: raise ValueError("Refuse to update without filters")
+        stmt = self._apply_bulk_statement(filters, values)
         with get_session() as session:
-            stmt = update(self.model).filter_by(**filters).values(**values)
             result = cast(CursorResult, session.execute(stmt))
-            return result.rowcount or 0
+        self._invalidate_model()
+        return result.rowcount or 0
 
     def purge(self, primary_key: Any) -> bool:
         """ Delete entry by primary key """
@@ -62,12 +272,13 @@ class BaseBroker(Generic[T]):
             entry = session.get(self.model, primary_key)
             if not entry: return False
             session.delete(entry)
-            return True
+        self._invalidate_deleted(primary_key)
+        return True
 
     def purge_bulk(self, filters: dict[str, Any]) -> int:
         """ Delete in bulk by cusotm filters in dictionary, return total deleted rows count """
-        if not filters: raise ValueError("Refuse to purge without filters")
+        stmt = self._purge_bulk_statement(filters)
         with get_session() as session:
-            stmt = delete(self.model).filter_by(**filters)
             result = cast(CursorResult, session.execute(stmt))
-            return result.rowcount or 0
+        self._invalidate_deleted()
+        return result.rowcount or 0
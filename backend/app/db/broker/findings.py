@@ -1,10 +1,97 @@
+from collections.abc import Sequence
+from typing import Optional, Any
+from sqlalchemy import select, insert, func, cast, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG, insert as pg_insert
 from app.db.models.findings import Findings
+from app.db.models.runs import Runs
+from app.db.models.finding_fingerprints import FindingFingerprints
+from app.db.models.finding_rollups import FindingRollups
+from app.domain.findings import FindingSeverity, FindingType, finding_fingerprint
 from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
+from app.db.ids import uuid7
+from app.db.session import get_session
+from datetime import datetime
+import uuid
 
 
 class FindingsBroker(BaseBroker[Findings]):
-    def __init__(self):
-        super().__init__(Findings)
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(Findings, cache)
+
+    def upsert(self, data: dict[str, Any], target: str, key_evidence: Optional[str] = None) -> tuple[uuid.UUID, bool]:
+        """ Record a finding once per project by fingerprint, repeated occurrences only bump last_seen and the count,
+            return canonical finding id and whether it was newly created """
+        fingerprint = finding_fingerprint(target, data["finding_type"], data["title"], key_evidence or data["evidence"])
+        project_id = select(Runs.project_id).where(Runs.id == data["run_id"]).scalar_subquery()
+        stmt = pg_insert(FindingFingerprints).values(
+            project_id=project_id,
+            fingerprint=fingerprint,
+            finding_id=uuid7(),
+            last_run_id=data["run_id"],
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FindingFingerprints.project_id, FindingFingerprints.fingerprint],
+            set_={
+                "last_seen": func.now(),
+                "occurrences": FindingFingerprints.occurrences + 1,
+                "last_run_id": stmt.excluded.last_run_id,
+            },
+        ).returning(
+            FindingFingerprints.finding_id,
+            FindingFingerprints.finding_created_at,
+            # xmax is only zero on a freshly inserted row version
+            literal_column("xmax = 0").label("inserted"),
+        )
+
+        with get_session() as session:
+            finding_id, created_at, inserted = session.execute(stmt).one()
+            if inserted:
+                session.execute(insert(Findings).values({**data, "id": finding_id, "created_at": created_at, "fingerprint": fingerprint}))
+        return finding_id, inserted
+
+    def search(self, query: str, project_id: Optional[Any] = None, min_severity: Optional[FindingSeverity] = None,
+               limit: int = 50, cursor: Optional[tuple[float, datetime, Any]] = None) -> tuple[Sequence[Findings], Optional[tuple[float, datetime, Any]]]:
+        """ Full text search findings in web search syntax, return entries ranked best first and cursor of next page """
+        # english stems prose such as "SQL Injection", simple matches identifiers verbatim as they are in evidence
+        english, simple = cast("english", REGCONFIG), cast("simple", REGCONFIG)
+        terms = func.websearch_to_tsquery(english, query).op("||")(func.websearch_to_tsquery(simple, query))
+        rank = func.ts_rank_cd(Findings.search_vector, terms)
+        keyset = tuple_(rank, Findings.created_at, Findings.id)
+
+        stmt = select(Findings, rank).where(Findings.search_vector.op("@@")(terms))
+        if project_id is not None:
+            stmt = stmt.join(Runs, Findings.run_id == Runs.id).where(Runs.project_id == project_id)
+        # enum values compare in declaration order, LOW < MEDIUM < HIGH < CRITICAL
+        if min_severity is not None: stmt = stmt.where(Findings.severity >= min_severity)
+        if cursor is not None: stmt = stmt.where(keyset < tuple_(*cursor))
+        stmt = stmt.order_by(rank.desc(), Findings.created_at.desc(), Findings.id.desc()).limit(limit)
+
+        with get_session() as session:
+            rows = session.execute(stmt).all()
+        entries = [entry for entry, _ in rows]
+        if len(rows) < limit: return entries, None
+        last, last_rank = rows[-1]
+        return entries, (last_rank, last.created_at, last.id)
+
+    def count_by_severity(self, project_id: Optional[Any] = None, run_id: Optional[Any] = None) -> dict[FindingSeverity, int]:
+        """ Findings count per severity of a project or run, read from the rollups instead of scanning findings """
+        return self._rollup(FindingRollups.severity, project_id, run_id)
+
+    def count_by_type(self, project_id: Optional[Any] = None, run_id: Optional[Any] = None) -> dict[FindingType, int]:
+        """ Findings count per finding type of a project or run, read from the rollups instead of scanning findings """
+        return self._rollup(FindingRollups.finding_type, project_id, run_id)
+
+    def count_by_run(self, project_id: Any) -> dict[uuid.UUID, int]:
+        """ Findings count per run of a project, runs without findings are omitted """
+        return self._rollup(FindingRollups.run_id, project_id, None)
+
+    def _rollup(self, key: Any, project_id: Optional[Any], run_id: Optional[Any]) -> dict[Any, int]:
+        query = select(key, func.sum(FindingRollups.count)).group_by(key)
+        if project_id is not None: query = query.where(FindingRollups.project_id == project_id)
+        if run_id is not None: query = query.where(FindingRollups.run_id == run_id)
+        with get_session() as session:
+            return {bucket: int(count) for bucket, count in session.execute(query)}
 
 
 if __name__ == "__main__":
@@ -1,10 +1,38 @@
+from typing import Optional, Any
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
 from app.db.models.projects import Projects
+from app.db.models.runs import Runs
+from app.db.models.finding_rollups import FindingRollups
 from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
+from app.db.session import get_session
+import uuid
 
 
 class ProjectsBroker(BaseBroker[Projects]):
-    def __init__(self):
-        super().__init__(Projects)
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(Projects, cache)
+
+    def get_tree(self, project_id: Any) -> Optional[tuple[Projects, dict[uuid.UUID, int]]]:
+        """ Get project with its targets, runs and reports loaded, along with findings count per run """
+        # one query per relationship level, independent of how many runs the project has
+        project = self.get(project_id, options=(
+            selectinload(Projects.targets),
+            selectinload(Projects.runs).selectinload(Runs.reports),
+        ))
+        if not project: return None
+
+        # rollups hold a handful of buckets per run, this no longer scans the project findings
+        with get_session() as session:
+            query = (
+                select(FindingRollups.run_id, func.sum(FindingRollups.count))
+                .where(FindingRollups.project_id == project.id)
+                .group_by(FindingRollups.run_id)
+            )
+            counts = {run_id: int(count) for run_id, count in session.execute(query)}
+
+        return project, counts
 
 
 if __name__ == "__main__":
@@ -1,10 +1,12 @@
+from typing import Optional
 from app.db.models.reports import Reports
 from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
 
 
 class ReportsBroker(BaseBroker[Reports]):
-    def __init__(self):
-        super().__init__(Reports)
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(Reports, cache)
 
 
 if __name__ == "__main__":
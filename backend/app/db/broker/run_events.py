@@ -0,0 +1,31 @@
+from collections.abc import Sequence
+from typing import Optional, Any, cast
+from sqlalchemy import select, delete, func
+from sqlalchemy.engine import CursorResult
+from app.db.models.run_events import RunEvents
+from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
+from app.db.session import get_session
+from datetime import timedelta
+
+
+class RunEventsBroker(BaseBroker[RunEvents]):
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(RunEvents, cache)
+
+    def get_since(self, after: int, project_id: Optional[Any] = None, limit: int = 1000) -> Sequence[RunEvents]:
+        """ Retrieve events journaled after the given event id in order, optionally of one project only """
+        query = select(RunEvents).where(RunEvents.id > after).order_by(RunEvents.id).limit(limit)
+        if project_id is not None: query = query.where(RunEvents.project_id == project_id)
+        with get_session() as session:
+            return session.scalars(query).all()
+
+    def prune(self, older_than: timedelta) -> int:
+        """ Delete events older than the given age, return total deleted rows count """
+        with get_session() as session:
+            result = cast(CursorResult, session.execute(delete(RunEvents).where(RunEvents.created_at < func.now() - older_than)))
+        return result.rowcount or 0
+
+
+if __name__ == "__main__":
+    pass
@@ -1,10 +1,112 @@
+from typing import Optional, Any, BinaryIO, Union
+from collections.abc import Iterable, Sequence
+from sqlalchemy import select, update, func, tuple_
 from app.db.models.runs import Runs
+from app.domain.runs import RunOutputFormat, RunPurpose, RunStatus
 from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
+from app.db.session import get_session
+from app.storage.artifacts import ArtifactStore, artifact_store
+from datetime import timedelta
 
 
 class RunsBroker(BaseBroker[Runs]):
-    def __init__(self):
-        super().__init__(Runs)
+    def __init__(self, cache: Optional[EntityCache] = None, store: ArtifactStore = artifact_store):
+        super().__init__(Runs, cache)
+        self.store = store
+
+    def attach_output(self, primary_key: Any, content: Union[bytes, BinaryIO, Iterable[bytes]],
+                      output_format: RunOutputFormat) -> Optional[Runs]:
+        """ Store raw tool output in the artifact store and reference it from the run, return modified run """
+        digest = self.store.put(content)
+        return self.apply(primary_key, {"output_digest": digest, "output_format": output_format})
+
+    def open_output(self, run: Runs) -> Optional[BinaryIO]:
+        """ Stream the decompressed raw tool output of a run, None when the run has no stored output """
+        if not run.output_digest: return None
+        return self.store.open(run.output_digest)
+
+    def claim(self, worker: str, lease_seconds: float, limit: int = 1, tools: Optional[Sequence[str]] = None) -> Sequence[Runs]:
+        """ Lease up to limit queued runs of the given tools to the worker, highest priority and oldest first, return claimed runs """
+        # locked rows are skipped instead of waited on, so concurrent workers never claim or block on the same run
+        queued = (
+            select(Runs.id, Runs.created_at)
+            .where(Runs.status == RunStatus.QUEUED)
+            .order_by(Runs.priority, Runs.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if tools is not None: queued = queued.where(Runs.tool_name.in_(tools))
+        stmt = (
+            update(Runs)
+            .where(tuple_(Runs.id, Runs.created_at).in_(queued))
+            .values(
+                status=RunStatus.RUNNING,
+                started_at=func.now(),
+                lease_owner=worker,
+                lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+            )
+            .returning(Runs)
+        )
+        return self._leased(stmt)
+
+    def heartbeat(self, primary_key: Any, worker: str, lease_seconds: float) -> bool:
+        """ Extend the lease the worker holds on a running run, False when the lease was lost """
+        stmt = (
+            update(Runs)
+            .where(Runs.id == primary_key, Runs.status == RunStatus.RUNNING, Runs.lease_owner == worker)
+            .values(lease_expires_at=func.now() + timedelta(seconds=lease_seconds))
+            .returning(Runs.id)
+        )
+        with get_session() as session:
+            return session.scalars(stmt).one_or_none() is not None
+
+    def release(self, primary_key: Any, worker: str, status: RunStatus, error: Optional[str] = None) -> Optional[Runs]:
+        """ Finish a run the worker holds the lease of, return finished run or None when the lease was lost """
+        stmt = (
+            update(Runs)
+            .where(Runs.id == primary_key, Runs.status == RunStatus.RUNNING, Runs.lease_owner == worker)
+            .values(status=status, finished_at=func.now(), lease_owner=None, lease_expires_at=None, last_error=error)
+            .returning(Runs)
+        )
+        runs = self._leased(stmt)
+        return runs[0] if runs else None
+
+    def reap_expired(self, limit: int = 100) -> Sequence[Runs]:
+        """ Fail running runs whose worker stopped heartbeating, return reaped runs """
+        expired = (
+            select(Runs.id, Runs.created_at)
+            .where(Runs.status == RunStatus.RUNNING, Runs.lease_expires_at < func.now())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Runs)
+            .where(tuple_(Runs.id, Runs.created_at).in_(expired))
+            .values(status=RunStatus.FAILED, finished_at=func.now(), lease_owner=None, lease_expires_at=None, last_error="lease expired")
+            .returning(Runs)
+        )
+        return self._leased(stmt)
+
+    def retry(self, run: Runs) -> Runs:
+        """ Queue a RETRY run repeating a failed run, return queued run """
+        return self.create({
+            "run_type": run.run_type,
+            "purpose": RunPurpose.RETRY,
+            "tool_name": run.tool_name,
+            "tool_version": run.tool_version,
+            "raw_command": run.raw_command,
+            "project_id": run.project_id,
+            "target_id": run.target_id,
+            "attempt": run.attempt + 1,
+            "retry_of": run.id,
+        })
+
+    def _leased(self, stmt: Any) -> Sequence[Runs]:
+        with get_session() as session:
+            runs = session.scalars(stmt).all()
+        self._invalidate(*(lambda cache, run_id=run.id: cache.invalidate(Runs, run_id) for run in runs))
+        return runs
 
 
 if __name__ == "__main__":
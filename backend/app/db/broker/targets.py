@@ -1,10 +1,72 @@
+from collections.abc import Sequence, Iterable
+from typing import Optional, Any
+from sqlalchemy import select, cast
+from sqlalchemy.exc import DataError
+from sqlalchemy.dialects.postgresql import INET
 from app.db.models.targets import Targets
+from app.domain.target import ScopeSet
 from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
+from app.db.session import get_session
+from contextlib import contextmanager
+import psycopg
+
+
+@contextmanager
+def validated_network():
+    """ Translate the cast failure of the generated network column into a validation error """
+    try:
+        yield
+    except (DataError, psycopg.DataError) as e:
+        # COPY raises the driver error itself, statements raise it wrapped
+        error = getattr(e, "orig", e)
+        if "type inet" not in str(error): raise
+        raise ValueError(f"Refuse to store an IP or CIDR target which is no valid address or network: {error}") from e
 
 
 class TargetsBroker(BaseBroker[Targets]):
-    def __init__(self):
-        super().__init__(Targets)
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(Targets, cache)
+
+    def create(self, data: dict[str, Any]) -> Targets:
+        with validated_network():
+            return super().create(data)
+
+    def create_bulk(self, entries: Iterable[dict[str, Any]]) -> list[Any]:
+        with validated_network():
+            return super().create_bulk(entries)
+
+    def apply(self, primary_key: Any, values: dict[str, Any]) -> Optional[Targets]:
+        with validated_network():
+            return super().apply(primary_key, values)
+
+    def apply_bulkj(self, filters: dict[str, Any], values: dict[str, Any]) -> int:
+        with validated_network():
+            return super().apply_bulkj(filters, values)
+
+    def get_covering(self, address: str, project_id: Optional[Any] = None) -> Sequence[Targets]:
+        """ Retrieve IP and CIDR targets whose network contains or equals the address or network """
+        return self._networks(">>=", address, project_id)
+
+    def get_within(self, network: str, project_id: Optional[Any] = None) -> Sequence[Targets]:
+        """ Retrieve IP and CIDR targets contained in or equal to the network """
+        return self._networks("<<=", network, project_id)
+
+    def get_overlapping(self, network: str, project_id: Optional[Any] = None) -> Sequence[Targets]:
+        """ Retrieve IP and CIDR targets sharing at least one address with the network """
+        return self._networks("&&", network, project_id)
+
+    def get_scope(self, project_id: Any) -> ScopeSet:
+        """ Merge the IP and CIDR targets of a project into a scope set for scan planning """
+        query = select(Targets.network).where(Targets.project_id == project_id, Targets.network.is_not(None))
+        with get_session() as session:
+            return ScopeSet(str(network) for network in session.scalars(query))
+
+    def _networks(self, operator: str, network: str, project_id: Optional[Any]) -> Sequence[Targets]:
+        query = select(Targets).where(Targets.network.op(operator)(cast(network, INET)))
+        if project_id is not None: query = query.where(Targets.project_id == project_id)
+        with get_session() as session:
+            return session.scalars(query).all()
 
 
 if __name__ == "__main__":
@@ -1,15 +1,16 @@
-from db.models.users import Users
-from db.broker.base import BaseBroker
+from typing import Optional
+from app.db.models.users import Users
+from app.db.broker.base import BaseBroker
+from app.db.cache import EntityCache
 
 
 class UsersBroker(BaseBroker[Users]):
-    def __init__(self):
-        super().__init__(Users)
+    def __init__(self, cache: Optional[EntityCache] = None):
+        super().__init__(Users, cache)
 
     def get_by_email(self, email: str) -> Users | None:
         """ Get user entry by specific email """
-        results = self.get_bulk({"email": email})
-        return results[0] if results else None
+        return self.get_by_unique("email", email)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from typing import Optional, Any
+from threading import Lock
+from sqlalchemy import inspect
+from app.db.base import Base
+import time
+
+# models removed or changed by triggers when a row of the key model is deleted, where no foreign key tells the cache
+DEPENDENTS: dict[type, set[type]] = {}
+
+
+def register_dependents(model: type, *dependents: type) -> None:
+    """ Declare models whose cached entities go stale when an entity of model is deleted """
+    DEPENDENTS.setdefault(model, set()).update(dependents)
+
+
+class EntityCache:
+    """ Thread safe LRU cache with TTL for detached entities, keyed by model and primary key or unique column """
+    def __init__(self, max_entries: int = 4096, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = Lock()
+        # (model, primary key) -> (expire time, model generation, entity)
+        self._entries: OrderedDict[tuple[type, Any], tuple[float, int, Any]] = OrderedDict()
+        # (model, column, value) -> primary key, resolved through `_entries`
+        self._aliases: OrderedDict[tuple[type, str, Any], Any] = OrderedDict()
+        # bumping a model generation invalidates all of its entries at once
+        self._generations: dict[type, int] = {}
+        # invalidations are numbered, so an entity read before one of them is refused when put afterwards
+        self._clock = 0
+        self._invalidated: OrderedDict[tuple[type, Any], int] = OrderedDict()
+        self._invalidated_models: dict[type, int] = {}
+        # newest invalidation forgotten from `_invalidated`, keys not found there may have been invalidated up to it
+        self._invalidated_floor = 0
+
+    def get(self, model: type, primary_key: Any) -> Optional[Any]:
+        """ Lookup entity by primary key, return None on miss """
+        with self._lock:
+            entity = self._lookup(model, primary_key)
+            self._count(entity)
+            return entity
+
+    def get_by(self, model: type, column: str, value: Any) -> Optional[Any]:
+        """ Lookup entity by unique column, return None on miss """
+        with self._lock:
+            entity = None
+            primary_key = self._aliases.get((model, column, value))
+            if primary_key is not None:
+                entity = self._lookup(model, primary_key)
+                # alias is stale once the entity got evicted or its column changed
+                if entity is None or getattr(entity, column) != value:
+                    del self._aliases[(model, column, value)]
+                    entity = None
+
+            self._count(entity)
+            return entity
+
+    def token(self) -> int:
+        """ Take before reading an entity from the database, and pass to `put` """
+        with self._lock:
+            return self._clock
+
+    def put(self, entity: Any, *columns: str, token: Optional[int] = None) -> None:
+        """ Store entity under its primary key, and alias it under the given unique columns, unless invalidated since token """
+        model = type(entity)
+        primary_key = inspect(entity).identity
+        if primary_key is None: return
+        primary_key = primary_key[0] if len(primary_key) == 1 else primary_key
+
+        with self._lock:
+            if token is not None and self._invalidated_since(model, primary_key, token): return
+            generation = self._generations.get(model, 0)
+            self._entries[(model, primary_key)] = (time.monotonic() + self.ttl, generation, entity)
+            self._entries.move_to_end((model, primary_key))
+            for column in columns:
+                self._aliases[(model, column, getattr(entity, column))] = primary_key
+                self._aliases.move_to_end((model, column, getattr(entity, column)))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            while len(self._aliases) > self.max_entries:
+                self._aliases.popitem(last=False)
+
+    def invalidate(self, model: type, primary_key: Any) -> None:
+        """ Drop a single entity, aliases pointing to it resolve as miss afterwards """
+        with self._lock:
+            self._entries.pop((model, primary_key), None)
+            self._clock += 1
+            self._invalidated[(model, primary_key)] = self._clock
+            self._invalidated.move_to_end((model, primary_key))
+            while len(self._invalidated) > self.max_entries:
+                _, forgotten = self._invalidated.popitem(last=False)
+                self._invalidated_floor = max(self._invalidated_floor, forgotten)
+
+    def invalidate_model(self, model: type) -> None:
+        """ Drop every entity of the model, used when the affected primary keys are unknown """
+        with self._lock:
+            self._generations[model] = self._generations.get(model, 0) + 1
+            self._clock += 1
+            self._invalidated_models[model] = self._clock
+
+    def invalidate_dependents(self, model: type) -> None:
+        """ Drop every entity of models whose foreign keys reference the model, as deleting it cascades or nulls them """
+        pending, visited = [model], {model}
+        while pending:
+            parent = pending.pop()
+            table = inspect(parent).local_table
+            for mapper in Base.registry.mappers:
+                dependent = mapper.class_
+                if dependent in visited: continue
+                referenced = any(fk.references(table) for fk in mapper.local_table.foreign_keys)
+                if referenced or dependent in DEPENDENTS.get(parent, ()):
+                    visited.add(dependent)
+                    pending.append(dependent)
+                    self.invalidate_model(dependent)
+
+    def clear(self) -> None:
+        """ Drop every cached entity and alias """
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """ Snapshot of the counters for sizing the cache """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _lookup(self, model: type, primary_key: Any) -> Optional[Any]:
+        """ Resolve an entry with the lock held, dropping it when expired or invalidated """
+        cached = self._entries.get((model, primary_key))
+        if cached is None: return None
+        expire_at, generation, entity = cached
+        if expire_at < time.monotonic() or generation != self._generations.get(model, 0):
+            del self._entries[(model, primary_key)]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end((model, primary_key))
+        return entity
+
+    def _invalidated_since(self, model: type, primary_key: Any, token: int) -> bool:
+        if self._invalidated_models.get(model, 0) > token: return True
+        return self._invalidated.get((model, primary_key), self._invalidated_floor) > token
+
+    def _count(self, entity: Optional[Any]) -> None:
+        if entity is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from threading import Lock
+import secrets
+import uuid
+import time
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """ Time ordered UUIDv7 (RFC 9562), monotonic within the process even for ids generated in the same millisecond """
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            # random start leaves most of the 12 bit counter for ids within the same millisecond
+            _last_ms, _counter = now_ms, secrets.randbits(10)
+        else:
+            # same millisecond or clock stepped back, count on and borrow the next millisecond on overflow
+            _counter += 1
+            if _counter > 0xFFF: _last_ms, _counter = _last_ms + 1, 0
+        timestamp, counter = _last_ms, _counter
+
+    value = (timestamp & 0xFFFF_FFFF_FFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(value: uuid.UUID) -> datetime:
+    """ Creation time embedded in a UUIDv7, millisecond precision """
+    if value.version != 7: raise ValueError(f"{value} is not a UUIDv7")
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
+
+
+if __name__ == "__main__":
+    pass
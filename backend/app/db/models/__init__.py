@@ -4,3 +4,12 @@ from .targets import Targets
 from .runs import Runs
 from .findings import Findings
 from .reports import Reports
+from .finding_fingerprints import FindingFingerprints
+from .finding_rollups import FindingRollups
+from .run_events import RunEvents
+
+from app.db.cache import register_dependents
+
+# the partitioned runs and findings tables cannot be referenced by foreign keys, their triggers cascade instead
+register_dependents(Runs, Findings, Reports)
+register_dependents(Findings, FindingFingerprints, FindingRollups)
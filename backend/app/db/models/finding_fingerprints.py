@@ -0,0 +1,35 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, DateTime, text, func, ForeignKey, Index
+from app.core.config import settings
+from app.db.base import Base
+from datetime import datetime
+import uuid
+
+if TYPE_CHECKING:
+    from .projects import Projects
+
+
+class FindingFingerprints(Base):
+    """ Registry of distinct findings per project, findings is partitioned so it cannot hold this unique key itself """
+    __tablename__ = "finding_fingerprints"
+    __table_args__ = (
+        Index("ix_finding_fingerprints_finding_id", "finding_id"),
+        {"schema": settings.DB_SCHEMA},
+    )
+
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.projects.id", ondelete="CASCADE"), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    occurrences: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("1"))
+
+    # canonical finding the repeated occurrences collapse into, with its partition key
+    finding_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    finding_created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+
+    # relationships
+    project: Mapped[Projects] = relationship("Projects")
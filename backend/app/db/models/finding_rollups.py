@@ -0,0 +1,32 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Enum, Integer, text, ForeignKey, Index
+from app.domain.findings import FindingSeverity, FindingType
+from app.core.config import settings
+from app.db.base import Base
+import uuid
+
+if TYPE_CHECKING:
+    from .projects import Projects
+
+
+class FindingRollups(Base):
+    """ Findings count per run, severity and type, maintained by statement triggers on findings """
+    __tablename__ = "finding_rollups"
+    __table_args__ = (
+        Index("ix_finding_rollups_project_id", "project_id"),
+        {"schema": settings.DB_SCHEMA},
+    )
+
+    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    severity: Mapped[FindingSeverity] = mapped_column(Enum(FindingSeverity, name="finding_severity_enum", schema=settings.DB_SCHEMA, native_enum=True, create_type=False), primary_key=True)
+    finding_type: Mapped[FindingType] = mapped_column(Enum(FindingType, name="finding_type_enum", schema=settings.DB_SCHEMA, native_enum=True, create_type=False), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+    # foreign keys, runs.id alone is not unique on the partitioned table so rows of a deleted run are removed by trigger
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.projects.id", ondelete="CASCADE"), nullable=False)
+
+    # relationships
+    project: Mapped[Projects] = relationship("Projects")
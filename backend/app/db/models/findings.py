@@ -1,8 +1,8 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Enum, SmallInteger, Text, String, DateTime, text, func, ForeignKey
+from sqlalchemy import Enum, SmallInteger, Text, String, DateTime, Computed, text, func, Index
 from app.domain.findings import FindingSeverity, FindingType
 from app.core.config import settings
 from app.db.base import Base
@@ -12,22 +12,42 @@ import uuid
 if TYPE_CHECKING:
     from .runs import Runs
 
+# content and evidence are capped as a tsvector cannot exceed 1MB, long tool output would fail the insert
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', left(content, 65536)), 'B') || "
+    "setweight(to_tsvector('simple', left(evidence, 65536)), 'C')"
+)
+
 
 class Findings(Base):
     __tablename__ = "findings"
-    __table_args__ = {"schema": settings.DB_SCHEMA}
+    __table_args__ = (
+        Index("ix_findings_run_id_severity", "run_id", "severity"),
+        Index("ix_findings_run_id_created_at_id", "run_id", "created_at", "id"),
+        Index("ix_findings_search_vector", "search_vector", postgresql_using="gin"),
+        {"schema": settings.DB_SCHEMA, "postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # time ordered keys append to the right of the primary key index instead of splitting random pages
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text(f"{settings.DB_SCHEMA}.uuid_generate_v7()"))
+    # partition key, part of the table primary key as PostgreSQL requires
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
     finding_type: Mapped[FindingType] = mapped_column(Enum(FindingType, name="finding_type_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False)
     severity: Mapped[FindingSeverity] = mapped_column(Enum(FindingSeverity, name="finding_severity_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     evidence: Mapped[str] = mapped_column(Text, nullable=False)
     confidence: Mapped[float] = mapped_column(SmallInteger, nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=True)
+    # stemmed prose in title and content, evidence kept verbatim for identifiers such as CVE ids and banners
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True), nullable=True, deferred=True)
 
-    # foreign keys
-    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.runs.id", ondelete="CASCADE"), nullable=False)
+    # foreign keys, runs.id alone is not unique on the partitioned table so deletes cascade by trigger
+    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
 
     # relationships
-    run: Mapped[Runs] = relationship("Runs", back_populates="findings")
+    run: Mapped[Runs] = relationship("Runs", back_populates="findings", primaryjoin="Runs.id == foreign(Findings.run_id)")
+
+    # entries are still identified by id alone
+    __mapper_args__ = {"primary_key": [id]}
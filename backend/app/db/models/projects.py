@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from sqlalchemy import Enum, String, DateTime, Text, text, func, ForeignKey
+from sqlalchemy import Enum, String, DateTime, Text, text, func, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.domain.projects import ProjectStatus
@@ -17,13 +17,18 @@ if TYPE_CHECKING:
 
 class Projects(Base):
     __tablename__ = "projects"
-    __table_args__ = {"schema": settings.DB_SCHEMA}
+    __table_args__ = (
+        Index("ix_projects_owner_id", "owner_id"),
+        {"schema": settings.DB_SCHEMA},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     project_status: Mapped[ProjectStatus] = mapped_column(Enum(ProjectStatus, name="project_status_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False, server_default=text("'ACTIVE'"))
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
+    # set while the project tree lives in cold storage instead of the tables
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # foreign keys
     owner_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.users.id", ondelete="CASCADE"), nullable=False)
@@ -2,7 +2,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Enum, String, Text, DateTime, text, func, ForeignKey
+from sqlalchemy import Enum, String, Text, DateTime, text, func, Index
 from app.domain.reports import ReportFormat
 from app.core.config import settings
 from app.db.base import Base
@@ -15,17 +15,20 @@ if TYPE_CHECKING:
 
 class Reports(Base):
     __tablename__ = "reports"
-    __table_args__ = {"schema": settings.DB_SCHEMA}
+    __table_args__ = (
+        Index("ix_reports_run_id", "run_id"),
+        {"schema": settings.DB_SCHEMA},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text(f"{settings.DB_SCHEMA}.uuid_generate_v7()"))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     summary: Mapped[str] = mapped_column(Text, nullable=True)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     report_format: Mapped[ReportFormat] = mapped_column(Enum(ReportFormat, name="report_format_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False)
 
-    # foreign keys
-    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.runs.id", ondelete="CASCADE"), nullable=False)
+    # foreign keys, runs.id alone is not unique on the partitioned table so deletes cascade by trigger
+    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
 
     # relationships
-    run: Mapped[Runs] = relationship("Runs", back_populates="reports")
+    run: Mapped[Runs] = relationship("Runs", back_populates="reports", primaryjoin="Runs.id == foreign(Reports.run_id)")
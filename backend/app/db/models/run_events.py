@@ -0,0 +1,27 @@
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, String, DateTime, Identity, func, Index
+from app.core.config import settings
+from app.db.base import Base
+from datetime import datetime
+from typing import Any
+import uuid
+
+
+class RunEvents(Base):
+    """ Journal of run status changes and new findings, written and notified by triggers, replayed on resumption """
+    __tablename__ = "run_events"
+    __table_args__ = (
+        Index("ix_run_events_project_id_id", "project_id", "id"),
+        Index("ix_run_events_created_at", "created_at"),
+        {"schema": settings.DB_SCHEMA},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(always=True), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    event: Mapped[str] = mapped_column(String(32), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+
+    # no foreign keys, events outlive nothing they reference and are pruned by age
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    run_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
@@ -2,8 +2,8 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Enum, String, Text, DateTime, text, func, ForeignKey
-from app.domain.runs import RunType, RunPurpose, RunStatus, RunOutputFormat
+from sqlalchemy import Enum, String, Text, DateTime, SmallInteger, Computed, text, func, ForeignKey, Index
+from app.domain.runs import RunType, RunPurpose, RunStatus, RunOutputFormat, RUN_PRIORITY
 from app.core.config import settings
 from app.db.base import Base
 from datetime import datetime
@@ -15,13 +15,27 @@ if TYPE_CHECKING:
     from .findings import Findings
     from .reports import Reports
 
+RUN_PRIORITY_CASE = "CASE purpose {} ELSE {} END".format(
+    " ".join(f"WHEN '{purpose.name}' THEN {priority}" for purpose, priority in RUN_PRIORITY.items()),
+    len(RUN_PRIORITY),
+)
+
 
 class Runs(Base):
     __tablename__ = "runs"
-    __table_args__ = {"schema": settings.DB_SCHEMA}
+    __table_args__ = (
+        Index("ix_runs_project_id_status_created_at", "project_id", "status", "created_at"),
+        Index("ix_runs_project_id_created_at_id", "project_id", "created_at", "id"),
+        Index("ix_runs_target_id", "target_id"),
+        # partial indexes stay as small as the queue itself, not the whole run history
+        Index("ix_runs_queue", "priority", "created_at", postgresql_where=text("status = 'QUEUED'")),
+        Index("ix_runs_lease_expires_at", "lease_expires_at", postgresql_where=text("status = 'RUNNING'")),
+        {"schema": settings.DB_SCHEMA, "postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text(f"{settings.DB_SCHEMA}.uuid_generate_v7()"))
+    # partition key, part of the table primary key as PostgreSQL requires
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
     run_type: Mapped[RunType] = mapped_column(Enum(RunType, name="run_type_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=True)
     purpose: Mapped[RunPurpose] = mapped_column(Enum(RunPurpose, name="run_purpose_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=True)
     status: Mapped[RunStatus] = mapped_column(Enum(RunStatus, name="run_status_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False, server_default=text("'QUEUED'"))
@@ -31,6 +45,16 @@ class Runs(Base):
     started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
     finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
     output_format: Mapped[RunOutputFormat] = mapped_column(Enum(RunOutputFormat, name="run_output_format_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=True)
+    output_digest: Mapped[str] = mapped_column(String(64), nullable=True)
+
+    # work queue state, a worker owns a running run until its lease expires unless it heartbeats
+    priority: Mapped[int] = mapped_column(SmallInteger, Computed(RUN_PRIORITY_CASE, persisted=True), nullable=True)
+    attempt: Mapped[int] = mapped_column(SmallInteger, nullable=False, server_default=text("1"))
+    lease_owner: Mapped[str] = mapped_column(String(128), nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    # failed run this one retries, no foreign key as runs.id alone is not unique on the partitioned table
+    retry_of: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
 
     # foreign keys
     project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.projects.id", ondelete="CASCADE"), nullable=False)
@@ -39,5 +63,8 @@ class Runs(Base):
     # relationships
     project: Mapped[Projects] = relationship("Projects", back_populates="runs")
     target: Mapped[Targets | None] = relationship("Targets", back_populates="runs")
-    findings: Mapped[list[Findings]] = relationship("Findings", back_populates="run", cascade="all, delete-orphan")
-    reports: Mapped[list[Reports]] = relationship("Reports", back_populates="run", cascade="all, delete-orphan")
+    findings: Mapped[list[Findings]] = relationship("Findings", back_populates="run", cascade="all, delete-orphan", primaryjoin="Runs.id == foreign(Findings.run_id)")
+    reports: Mapped[list[Reports]] = relationship("Reports", back_populates="run", cascade="all, delete-orphan", primaryjoin="Runs.id == foreign(Reports.run_id)")
+
+    # entries are still identified by id alone
+    __mapper_args__ = {"primary_key": [id]}
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Enum, String, Text, DateTime, text, func, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, INET
+from sqlalchemy import Enum, String, Text, DateTime, Computed, text, func, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.domain.target import TargetType
 from app.core.config import settings
@@ -16,13 +16,19 @@ if TYPE_CHECKING:
 
 class Targets(Base):
     __tablename__ = "targets"
-    __table_args__ = {"schema": settings.DB_SCHEMA}
+    __table_args__ = (
+        Index("ix_targets_project_id_created_at_id", "project_id", "created_at", "id"),
+        Index("ix_targets_network", "network", postgresql_using="gist", postgresql_ops={"network": "inet_ops"}),
+        {"schema": settings.DB_SCHEMA},
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, server_default=text(f"{settings.DB_SCHEMA}.uuid_generate_v7()"))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     target_type: Mapped[TargetType] = mapped_column(Enum(TargetType, name="target_type_enum", schema=settings.DB_SCHEMA, native_enum=True), nullable=False)
     label: Mapped[str] = mapped_column(String(255), nullable=True)
     value: Mapped[str] = mapped_column(Text, nullable=False)
+    # typed address of IP and CIDR targets, so containment and overlap are answered by the GiST index
+    network: Mapped[str] = mapped_column(INET, Computed("CASE WHEN target_type IN ('IP', 'CIDR') THEN btrim(value)::inet END", persisted=True), nullable=True)
 
     # foreign keys
     project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey(f"{settings.DB_SCHEMA}.projects.id", ondelete="CASCADE"), nullable=False)
@@ -0,0 +1,177 @@
+from datetime import date, datetime, timezone
+from threading import Event
+from typing import Optional
+from sqlalchemy import create_engine, text, pool
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.db.rollups import subtract_rollups
+import logging
+import re
+
+logger = logging.getLogger("app.db.partitions")
+
+# children before parents, so a run partition is only dropped after the findings created alongside it
+PARTITIONED_TABLES = ("findings", "runs")
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+def add_months(month: date, count: int) -> date:
+    """ Shift the first day of a month by count months """
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_of(moment: datetime) -> date:
+    """ First day of the UTC month the moment falls in """
+    moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def retention_cutoff(retention_months: int, now: Optional[datetime] = None) -> date:
+    """ First month kept by retention, partitions of earlier months are dropped """
+    return add_months(month_of(now or datetime.now(timezone.utc)), -retention_months)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def list_partitions(engine: Engine, table: str) -> list[tuple[str, date]]:
+    """ List partitions attached to the table along with the month they hold, oldest first """
+    query = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_namespace ON pg_namespace.oid = parent.relnamespace "
+        "WHERE pg_namespace.nspname = :schema AND parent.relname = :table"
+    )
+    with engine.connect() as conn:
+        names = conn.scalars(query, {"schema": settings.DB_SCHEMA, "table": table}).all()
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and match["table"] == table:
+            partitions.append((name, date(int(match["year"]), int(match["month"]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = 3, now: Optional[datetime] = None) -> list[str]:
+    """ Create missing monthly partitions from the current month up to months ahead, return created partitions """
+    current = month_of(now or datetime.now(timezone.utc))
+    created = []
+    for table in reversed(PARTITIONED_TABLES):
+        existing = {month for _, month in list_partitions(engine, table)}
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month in existing: continue
+            created.append(create_partition(engine, table, month))
+    return created
+
+
+def maintain_partitions(engine: Engine, months_ahead: int, interval: float, stopping: Event) -> None:
+    """ Create partitions ahead every interval seconds until stopping is set, inserts fail once no partition holds the month """
+    while True:
+        try:
+            created = ensure_partitions(engine, months_ahead)
+            if created: logger.info("Created partitions %s", ", ".join(created))
+        except Exception:
+            logger.exception("Creating partitions ahead failed, retrying in %.0f seconds", interval)
+        if stopping.wait(interval): return
+
+
+def create_partition(engine: Engine, table: str, month: date) -> str:
+    """ Create the partition of table holding month unless it exists, return its name """
+    name = partition_name(table, month)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{settings.DB_SCHEMA}"."{name}" '
+            f'PARTITION OF "{settings.DB_SCHEMA}"."{table}" '
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+        ))
+    return name
+
+
+def list_detached(engine: Engine, table: str) -> list[tuple[str, date]]:
+    """ List partition named tables of table which are no longer attached, left over by an interrupted drop """
+    query = text(
+        "SELECT pg_class.relname FROM pg_class "
+        "JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace "
+        "WHERE pg_namespace.nspname = :schema AND pg_class.relkind = 'r' AND NOT pg_class.relispartition "
+        "AND pg_class.relname LIKE :pattern"
+    )
+    with engine.connect() as conn:
+        names = conn.scalars(query, {"schema": settings.DB_SCHEMA, "pattern": f"{table}\\_y%"}).all()
+
+    detached = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and match["table"] == table:
+            detached.append((name, date(int(match["year"]), int(match["month"]), 1)))
+    return sorted(detached, key=lambda partition: partition[1])
+
+
+def finalize_detaches(engine: Engine, table: str) -> list[str]:
+    """ Complete concurrent detaches of table that were interrupted, return the partitions finalized """
+    query = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_namespace ON pg_namespace.oid = parent.relnamespace "
+        "WHERE pg_namespace.nspname = :schema AND parent.relname = :table AND pg_inherits.inhdetachpending"
+    )
+    with engine.connect() as conn:
+        names = conn.scalars(query, {"schema": settings.DB_SCHEMA, "table": table}).all()
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name in names:
+            conn.execute(text(f'ALTER TABLE "{settings.DB_SCHEMA}"."{table}" DETACH PARTITION "{settings.DB_SCHEMA}"."{name}" FINALIZE'))
+    return list(names)
+
+
+def drop_detached(engine: Engine, table: str, name: str) -> None:
+    """ Remove what the delete triggers would have for the rows of a detached partition, and drop it in the same transaction """
+    schema = settings.DB_SCHEMA
+    with engine.begin() as conn:
+        # dropping a partition fires no delete trigger, either all of the cleanup and the drop commit or none of it does
+        if table == "findings":
+            conn.execute(text(
+                f'DELETE FROM "{schema}".finding_fingerprints WHERE finding_id IN (SELECT id FROM "{schema}"."{name}")'
+            ))
+            subtract_rollups(conn, f'"{schema}"."{name}"')
+        if table == "runs":
+            conn.execute(text(f'DELETE FROM "{schema}".reports WHERE run_id IN (SELECT id FROM "{schema}"."{name}")'))
+        conn.execute(text(f'DROP TABLE "{schema}"."{name}"'))
+
+
+def drop_expired_partitions(engine: Engine, retention_months: int = 18, now: Optional[datetime] = None) -> list[str]:
+    """ Detach and drop partitions entirely older than the retention window, return dropped partitions """
+    cutoff = retention_cutoff(retention_months, now)
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        # a previous run may have stopped between detaching and dropping
+        finalize_detaches(engine, table)
+        for name, month in list_detached(engine, table):
+            if month >= cutoff: continue
+            drop_detached(engine, table, name)
+            dropped.append(name)
+
+        for name, month in list_partitions(engine, table):
+            if month >= cutoff: break
+            # detaching concurrently only takes a brief lock on the parent, but cannot run inside a transaction
+            with engine.connect() as conn:
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+                conn.execute(text(f'ALTER TABLE "{settings.DB_SCHEMA}"."{table}" DETACH PARTITION "{settings.DB_SCHEMA}"."{name}" CONCURRENTLY'))
+            drop_detached(engine, table, name)
+            dropped.append(name)
+    return dropped
+
+
+def main():
+    # partition DDL needs the migration role, which owns the tables
+    engine = create_engine(settings.DB_MIGRATE_URL, poolclass=pool.NullPool)
+    print("Created partitions:", ensure_partitions(engine, settings.DB_PARTITION_MONTHS_AHEAD))
+    print("Dropped partitions:", drop_expired_partitions(engine, settings.DB_RETENTION_MONTHS))
+
+
+if __name__ == "__main__":
+    main()
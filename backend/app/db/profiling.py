@@ -0,0 +1,196 @@
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from typing import Optional, Any
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import hashlib
+import logging
+import time
+import sys
+import re
+
+logger = logging.getLogger("app.db.slow_query")
+
+# latency samples kept per statement for percentile estimation
+RESERVOIR_SIZE = 1024
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+VALUES_GROUPS = re.compile(r"\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))+")
+IN_LIST = re.compile(r"IN \(\?(?:, \?)+\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """ Reduce a statement to its shape, so batches of different size or literal values aggregate together """
+    statement = WHITESPACE.sub(" ", statement).strip()
+    statement = PLACEHOLDER.sub("?", statement)
+    statement = VALUES_GROUPS.sub("(...)", statement)
+    return IN_LIST.sub("IN (...)", statement)
+
+
+def broker_caller() -> str:
+    """ Name the innermost broker method on the current stack, as `Broker.method` """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").startswith("app.db.broker"):
+            owner = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            return f"{type(owner).__name__}.{name}" if owner is not None else name
+        frame = frame.f_back
+    return "unknown"
+
+
+class StatementStats:
+    """ Latency aggregate of one normalized statement issued by one caller """
+    def __init__(self, statement: str, caller: str):
+        self.statement = statement
+        self.caller = caller
+        self.query_id = hashlib.sha1(statement.encode("utf-8")).hexdigest()[:12]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentiles(self) -> dict[str, float]:
+        """ p50/p95/p99 over the most recent samples """
+        ordered = sorted(self.samples)
+        if not ordered: return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        pick = lambda ratio: ordered[min(len(ordered) - 1, int(ratio * len(ordered)))]
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+class StatementProfiler:
+    """
+    Opt-in per-statement latency tracking and slow query log built on cursor execute events.
+
+    At most max_statements aggregates are kept, the least recently executed statement is evicted first,
+    so statements whose shape normalization misses cannot grow the profiler without bound.
+    """
+    def __init__(self, engine: Engine, name: str, slow_threshold: float = 0.5, explain: bool = False, max_statements: int = 1000):
+        self.engine = engine
+        self.name = name
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.max_statements = max_statements
+        self.enabled = False
+        self._stats: OrderedDict[tuple[str, str], StatementStats] = OrderedDict()
+        self._lock = Lock()
+
+    def enable(self) -> None:
+        if self.enabled: return
+        event.listen(self.engine, "before_cursor_execute", self._before_execute)
+        event.listen(self.engine, "after_cursor_execute", self._after_execute)
+        event.listen(self.engine, "handle_error", self._handle_error)
+        self.enabled = True
+
+    def disable(self) -> None:
+        if not self.enabled: return
+        event.remove(self.engine, "before_cursor_execute", self._before_execute)
+        event.remove(self.engine, "after_cursor_execute", self._after_execute)
+        event.remove(self.engine, "handle_error", self._handle_error)
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """ Aggregates sorted by total time spent, hottest statement first """
+        with self._lock:
+            stats = list(self._stats.values())
+            rows = [{
+                "query_id": stat.query_id,
+                "statement": stat.statement,
+                "caller": stat.caller,
+                "count": stat.count,
+                "total": stat.total,
+                "max": stat.max,
+                **stat.percentiles(),
+            } for stat in stats]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get("query_start")
+        if not starts: return
+        elapsed = time.perf_counter() - starts.pop()
+        try:
+            self._observe(conn, statement, parameters, executemany, elapsed)
+        except Exception:
+            # profiling must never fail the statement it observed
+            logger.exception("Statement profiler failed to record a statement")
+
+    def _handle_error(self, context) -> None:
+        """ A failed statement never reaches after_cursor_execute, drop its start time so later timings stay paired """
+        # errors raised before a statement was sent never went through before_cursor_execute
+        if context.connection is None or context.execution_context is None or context.statement is None: return
+        starts = context.connection.info.get("query_start")
+        if starts: starts.pop()
+
+    def _observe(self, conn, statement: str, parameters: Any, executemany: bool, elapsed: float) -> None:
+        key = (normalize(statement), broker_caller())
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(*key)
+                if len(self._stats) > self.max_statements: self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(key)
+            stats.observe(elapsed)
+
+        if elapsed >= self.slow_threshold:
+            plan = self._explain(conn, statement, parameters) if self.explain and not executemany else None
+            logger.warning(
+                "Slow query %.3fs in %s\n%s\nparameters: %r%s",
+                elapsed, key[1], statement, parameters, f"\n{plan}" if plan else "",
+            )
+
+    def _explain(self, conn, statement: str, parameters: Any) -> Optional[str]:
+        """ Capture the estimated plan on the same DBAPI connection, plain EXPLAIN never executes the statement again """
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"): return None
+
+        # a plain DBAPI cursor bypasses the engine events, so this is not profiled itself
+        # closed explicitly, the cursor of the async adapter is no context manager
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            # savepoint keeps a failing EXPLAIN from aborting the caller's transaction
+            cursor.execute("SAVEPOINT explain_plan")
+            try:
+                cursor.execute("EXPLAIN " + statement, parameters)
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT explain_plan")
+                cursor.execute("RELEASE SAVEPOINT explain_plan")
+        except Exception as e:
+            return f"plan unavailable: {e}"
+        finally:
+            cursor.close()
+
+
+def render_profilers(profilers: Sequence[StatementProfiler]) -> str:
+    """ Render statement latency summaries of every profiler in text exposition format """
+    lines = [
+        "# HELP db_statement_duration_seconds Statement latency by normalized statement and broker method",
+        "# TYPE db_statement_duration_seconds summary",
+    ]
+    for profiler in profilers:
+        for row in profiler.snapshot():
+            labels = f'engine="{profiler.name}",query_id="{row["query_id"]}",caller="{row["caller"]}"'
+            for quantile in ("p50", "p95", "p99"):
+                lines.append(f'db_statement_duration_seconds{{{labels},quantile="0.{quantile[1:]}"}} {row[quantile]}')
+            lines.append(f"db_statement_duration_seconds_sum{{{labels}}} {row['total']}")
+            lines.append(f"db_statement_duration_seconds_count{{{labels}}} {row['count']}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,46 @@
+from typing import Optional, Any
+from sqlalchemy import create_engine, text, pool
+from sqlalchemy.engine import Engine, Connection
+from app.core.config import settings
+import argparse
+
+
+def subtract_rollups(conn: Connection, source: str) -> None:
+    """ Take findings of the source relation out of the rollups, for removals no trigger sees """
+    conn.execute(text(
+        f'UPDATE "{settings.DB_SCHEMA}".finding_rollups AS rollup SET count = rollup.count - removed.count '
+        f'FROM (SELECT run_id, severity, finding_type, count(*) AS count FROM {source} GROUP BY run_id, severity, finding_type) AS removed '
+        f'WHERE rollup.run_id = removed.run_id AND rollup.severity = removed.severity AND rollup.finding_type = removed.finding_type'
+    ))
+    conn.execute(text(f'DELETE FROM "{settings.DB_SCHEMA}".finding_rollups WHERE count <= 0'))
+
+
+def rebuild_rollups(engine: Engine, project_id: Optional[Any] = None) -> int:
+    """ Recount rollups from findings, of one project or all of them, return number of buckets written """
+    scope = "project_id = :project_id" if project_id is not None else "project_id IS NOT NULL"
+    params = {"project_id": project_id} if project_id is not None else {}
+    with engine.begin() as conn:
+        # block findings writes until commit, so triggers cannot apply a change the recount already saw
+        conn.execute(text(f'LOCK TABLE "{settings.DB_SCHEMA}".findings IN SHARE MODE'))
+        conn.execute(text(f'DELETE FROM "{settings.DB_SCHEMA}".finding_rollups WHERE {scope}'), params)
+        result = conn.execute(text(
+            f'INSERT INTO "{settings.DB_SCHEMA}".finding_rollups (project_id, run_id, severity, finding_type, count) '
+            f'SELECT runs.project_id, findings.run_id, findings.severity, findings.finding_type, count(*) '
+            f'FROM "{settings.DB_SCHEMA}".findings JOIN "{settings.DB_SCHEMA}".runs ON runs.id = findings.run_id '
+            f'WHERE runs.{scope} GROUP BY runs.project_id, findings.run_id, findings.severity, findings.finding_type'
+        ), params)
+    return result.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild findings rollups from the findings table")
+    parser.add_argument("--project", help="only rebuild the rollups of this project id")
+    args = parser.parse_args()
+
+    # locking findings needs the migration role, which owns the tables
+    engine = create_engine(settings.DB_MIGRATE_URL, poolclass=pool.NullPool)
+    print("Rebuilt rollup buckets:", rebuild_rollups(engine, args.project))
+
+
+if __name__ == "__main__":
+    main()
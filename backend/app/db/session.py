@@ -1,22 +1,76 @@
-from collections.abc import Generator
-from contextlib import contextmanager
+from collections.abc import Generator, AsyncGenerator, Callable
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.core.config import settings
+from app.core import metrics
+from app.db.telemetry import PoolTelemetry, TimedQueuePool, TimedAsyncAdaptedQueuePool, render_pools
+from app.db.profiling import StatementProfiler, render_profilers
 
 runtime_engine = create_engine(
     settings.DB_RUNTIME_URL,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    pool_recycle=3600
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE
 )
 session_factory = sessionmaker(bind=runtime_engine, autoflush=False, expire_on_commit=False)
 
+# psycopg resolves to its async variant under create_async_engine
+async_runtime_engine = create_async_engine(
+    settings.DB_RUNTIME_URL,
+    poolclass=TimedAsyncAdaptedQueuePool,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE
+)
+async_session_factory = async_sessionmaker(bind=async_runtime_engine, autoflush=False, expire_on_commit=False)
+
+# pool instrumentation, exposed through `app.core.metrics`
+runtime_pool_telemetry = PoolTelemetry(runtime_engine, "runtime")
+async_runtime_pool_telemetry = PoolTelemetry(async_runtime_engine.sync_engine, "async_runtime")
+metrics.register(lambda: render_pools([runtime_pool_telemetry, async_runtime_pool_telemetry]))
+
+# statement latency profiling, opt-in as it adds a stack walk to every execution
+runtime_profiler = StatementProfiler(runtime_engine, "runtime", settings.DB_SLOW_QUERY_SECONDS, settings.DB_PROFILE_EXPLAIN, settings.DB_PROFILE_MAX_STATEMENTS)
+async_runtime_profiler = StatementProfiler(async_runtime_engine.sync_engine, "async_runtime", settings.DB_SLOW_QUERY_SECONDS, settings.DB_PROFILE_EXPLAIN, settings.DB_PROFILE_MAX_STATEMENTS)
+if settings.DB_PROFILE:
+    runtime_profiler.enable()
+    async_runtime_profiler.enable()
+    metrics.register(lambda: render_profilers([runtime_profiler, async_runtime_profiler]))
+
+# session shared by every `get_session` call inside an active unit of work
+active_session: ContextVar[Optional[Session]] = ContextVar("active_session", default=None)
+active_async_session: ContextVar[Optional[AsyncSession]] = ContextVar("active_async_session", default=None)
+
+
+def after_commit(session: Session | AsyncSession, callback: Callable[[], None]) -> None:
+    """ Run callback once the unit of work owning session committed, it is discarded on rollback """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def run_after_commit(session: Session | AsyncSession) -> None:
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
 
 @contextmanager
 def get_session() -> Generator[Session, None, None]:
     """ General helper to auto manage database conneciton in `with` code block """
+    shared = active_session.get()
+    if shared is not None:
+        # join the surrounding unit of work, flush only and leave the commit to its owner
+        yield shared
+        shared.flush()
+        return
+
     session = session_factory()
     try:
         yield session
@@ -28,5 +82,70 @@ def get_session() -> Generator[Session, None, None]:
         session.close()
 
 
+@contextmanager
+def unit_of_work() -> Generator[Session, None, None]:
+    """ Run every `get_session` call in the `with` code block on one session, commit once on exit """
+    if active_session.get() is not None:
+        # nested unit of work simply joins the outer one
+        with get_session() as session:
+            yield session
+        return
+
+    session = session_factory()
+    token = active_session.set(session)
+    try:
+        yield session
+        session.commit()
+        run_after_commit(session)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        active_session.reset(token)
+        session.close()
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """ Async counterpart of `get_session` to auto manage database connection in `async with` code block """
+    shared = active_async_session.get()
+    if shared is not None:
+        yield shared
+        await shared.flush()
+        return
+
+    session = async_session_factory()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+@asynccontextmanager
+async def async_unit_of_work() -> AsyncGenerator[AsyncSession, None]:
+    """ Run every `get_async_session` call in the `async with` code block on one session, commit once on exit """
+    if active_async_session.get() is not None:
+        async with get_async_session() as session:
+            yield session
+        return
+
+    session = async_session_factory()
+    token = active_async_session.set(session)
+    try:
+        yield session
+        await session.commit()
+        run_after_commit(session)
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        active_async_session.reset(token)
+        await session.close()
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,148 @@
+from collections.abc import Sequence
+from typing import Optional, Any
+from threading import Lock
+from weakref import WeakSet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.core.metrics import Histogram
+import time
+
+
+class PoolTelemetry:
+    """ Connection pool instrumentation built on SQLAlchemy pool and engine events """
+    def __init__(self, engine: Engine, name: str):
+        self.engine = engine
+        self.name = name
+        self.checkout_wait = Histogram()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pre_ping_failures = 0
+        self.recycles = 0
+        self._lock = Lock()
+        # connection records seen connecting before, a reconnect without invalidation is a recycle
+        self._records: WeakSet = WeakSet()
+        self._invalidated: WeakSet = WeakSet()
+
+        pool = engine.pool
+        if isinstance(pool, TimedPoolMixin):
+            pool.telemetry = self
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_invalidate)
+        event.listen(engine, "handle_error", self._on_error)
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """ Record how long a checkout waited for the pool to hand out a connection """
+        self.checkout_wait.observe(seconds)
+        if timed_out:
+            with self._lock:
+                self.checkout_timeouts += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """ Current pool gauges and counters """
+        pool = self.engine.pool
+        in_use = pool.checkedout() if isinstance(pool, QueuePool) else 0
+        overflow = max(pool.overflow(), 0) if isinstance(pool, QueuePool) else 0
+        with self._lock:
+            return {
+                "pool": self.name,
+                "size": pool.size() if isinstance(pool, QueuePool) else 0,
+                "in_use": in_use,
+                "overflow_in_use": overflow,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pre_ping_failures": self.pre_ping_failures,
+                "recycles": self.recycles,
+                "checkout_wait": self.checkout_wait.snapshot(),
+            }
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+            if connection_record in self._records and connection_record not in self._invalidated:
+                self.recycles += 1
+            self._records.add(connection_record)
+            self._invalidated.discard(connection_record)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._invalidated.add(connection_record)
+
+    def _on_error(self, context) -> None:
+        if context.is_pre_ping:
+            with self._lock:
+                self.pre_ping_failures += 1
+
+
+def render_pools(telemetries: Sequence[PoolTelemetry]) -> str:
+    """ Render metrics of every pool in text exposition format, grouped by metric family """
+    snapshots = [(f'pool="{telemetry.name}"', telemetry, telemetry.snapshot()) for telemetry in telemetries]
+    lines = [
+        "# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection",
+        "# TYPE db_pool_checkout_wait_seconds histogram",
+    ]
+    for labels, telemetry, _ in snapshots:
+        lines += telemetry.checkout_wait.render("db_pool_checkout_wait_seconds", labels)
+
+    for key, kind, description in (
+        ("size", "gauge", "Configured number of persistent connections"),
+        ("in_use", "gauge", "Connections currently checked out"),
+        ("overflow_in_use", "gauge", "Overflow connections currently open beyond the pool size"),
+        ("checkouts", "counter", "Connections checked out"),
+        ("checkout_timeouts", "counter", "Checkouts that timed out waiting for a connection"),
+        ("connects", "counter", "New DBAPI connections opened"),
+        ("invalidations", "counter", "Connections invalidated"),
+        ("pre_ping_failures", "counter", "Pre-ping checks that found a dead connection"),
+        ("recycles", "counter", "Connections replaced after exceeding the recycle age"),
+    ):
+        name = f"db_pool_{key}" if kind == "gauge" else f"db_pool_{key}_total"
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{{{labels}}} {snapshot[key]}" for labels, _, snapshot in snapshots]
+    return "\n".join(lines) + "\n"
+
+
+class TimedPoolMixin:
+    """ Report the time spent inside `_do_get`, which blocks while the pool is exhausted """
+    telemetry: Optional[PoolTelemetry] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()  # type: ignore[misc]
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.observe_wait(time.perf_counter() - start, timed_out)
+
+    def recreate(self):
+        # `Engine.dispose` swaps in a recreated pool, keep reporting to the same telemetry
+        pool = super().recreate()  # type: ignore[misc]
+        pool.telemetry = self.telemetry
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+if __name__ == "__main__":
+    pass
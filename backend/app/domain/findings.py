@@ -1,4 +1,8 @@
 from enum import StrEnum
+import hashlib
+import re
+
+WHITESPACE = re.compile(r"\s+")
 
 
 class FindingType(StrEnum):
@@ -16,5 +20,21 @@ class FindingSeverity(StrEnum):
 
 
 
+def normalize_target(target: str) -> str:
+    """ Case and trailing slash insensitive form of a target """
+    return target.strip().lower().rstrip("/")
+
+
+def finding_fingerprint(target: str, finding_type: FindingType, title: str, evidence: str) -> str:
+    """ Deterministic SHA-256 identifying the same finding across runs, insensitive to case and whitespace """
+    parts = (
+        normalize_target(target),
+        FindingType(finding_type).value,
+        WHITESPACE.sub(" ", title).strip().lower(),
+        WHITESPACE.sub(" ", evidence).strip(),
+    )
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
 if __name__ == "__main__":
     pass
@@ -32,6 +32,16 @@ class RunOutputFormat(StrEnum):
     CSV = "csv"
 
 
+# queued runs are claimed lowest first, runs without a purpose go last
+RUN_PRIORITY = {
+    RunPurpose.PRIMARY: 0,
+    RunPurpose.RETRY: 1,
+    RunPurpose.SUBTASK: 2,
+    RunPurpose.VALIDATION: 3,
+    RunPurpose.ENRICHMENT: 4,
+}
+
+
 
 if __name__ == "__main__":
     pass
@@ -1,4 +1,10 @@
+from collections.abc import Iterable, Iterator
 from enum import StrEnum
+from typing import Union
+import ipaddress
+import bisect
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
 
 
 class TargetType(StrEnum):
@@ -8,6 +14,66 @@ class TargetType(StrEnum):
     URL = "url"
 
 
+class ScopeSet:
+    """ Merged, sorted address intervals of IP and CIDR scopes, kept apart per IP version """
+    def __init__(self, scopes: Iterable[str] = ()):
+        # version -> disjoint, non-adjacent (first, last) address intervals in ascending order
+        self._intervals: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+        self._starts: dict[int, list[int]] = {4: [], 6: []}
+        self.update(scopes)
+
+    def update(self, scopes: Iterable[str]) -> None:
+        """ Merge scopes in, in O(n log n) over all intervals """
+        pending: dict[int, list[tuple[int, int]]] = {4: list(self._intervals[4]), 6: list(self._intervals[6])}
+        for scope in scopes:
+            # host bits of a CIDR scope are ignored, 10.2.3.4/24 covers 10.2.3.0/24
+            network = ipaddress.ip_network(scope.strip(), strict=False)
+            pending[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+        for version, intervals in pending.items():
+            merged: list[tuple[int, int]] = []
+            for first, last in sorted(intervals):
+                # overlapping or adjacent intervals collapse into one
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+                else:
+                    merged.append((first, last))
+            self._intervals[version] = merged
+            self._starts[version] = [first for first, _ in merged]
+
+    def __contains__(self, address: str) -> bool:
+        """ Whether an address, or every address of a network, is in scope, in O(log n) """
+        network = ipaddress.ip_network(address.strip(), strict=False)
+        first, last = int(network.network_address), int(network.broadcast_address)
+        index = bisect.bisect_right(self._starts[network.version], first) - 1
+        return index >= 0 and self._intervals[network.version][index][1] >= last
+
+    def __len__(self) -> int:
+        return len(self._intervals[4]) + len(self._intervals[6])
+
+    def overlaps(self, other: "ScopeSet") -> bool:
+        """ Whether any address is in both scope sets, in O(n + m) """
+        for version in (4, 6):
+            ours, theirs = self._intervals[version], other._intervals[version]
+            i = j = 0
+            while i < len(ours) and j < len(theirs):
+                if ours[i][0] <= theirs[j][1] and theirs[j][0] <= ours[i][1]: return True
+                if ours[i][1] < theirs[j][1]: i += 1
+                else: j += 1
+        return False
+
+    def networks(self) -> Iterator[IPNetwork]:
+        """ Minimal list of CIDR networks covering the merged scopes, to dispatch each address once """
+        for version, address in ((4, ipaddress.IPv4Address), (6, ipaddress.IPv6Address)):
+            for first, last in self._intervals[version]:
+                yield from ipaddress.summarize_address_range(address(first), address(last))
+
+
+def merge_scopes(scopes: Iterable[str]) -> list[IPNetwork]:
+    """ Merge overlapping and adjacent IP / CIDR scopes into the fewest covering networks """
+    return list(ScopeSet(scopes).networks())
+
+
 
 if __name__ == "__main__":
     pass
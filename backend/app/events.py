@@ -0,0 +1,235 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from typing import Optional, Any
+from urllib.parse import urlparse, parse_qs
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+from app.core import metrics
+from app.db.models.run_events import RunEvents
+from app.db.broker.run_events import RunEventsBroker
+from datetime import timedelta
+import psycopg
+import logging
+import queue
+import json
+import time
+import uuid
+
+logger = logging.getLogger("app.events")
+
+CHANNEL = "run_events"
+# a subscriber this many events behind is disconnected, it catches up from the journal on reconnect
+SUBSCRIBER_BUFFER = 1024
+KEEPALIVE_SECONDS = 15.0
+PRUNE_SECONDS = 3600.0
+# event ids are taken at insert but transactions commit out of order, so resumption replays this many ids before the last one seen
+REPLAY_LAG = 1024
+
+
+def event_dict(entry: RunEvents) -> dict[str, Any]:
+    """ Journaled event in the same shape as a notification payload """
+    return {
+        "id": entry.id,
+        "created_at": entry.created_at.isoformat(),
+        "event": entry.event,
+        "payload": entry.payload,
+        "project_id": str(entry.project_id),
+        "run_id": str(entry.run_id),
+    }
+
+
+class DeliveredIds:
+    """ Event ids delivered recently, a lower id committing after a higher one is still delivered once """
+    def __init__(self, lag: int = REPLAY_LAG):
+        self.lag = lag
+        self.highest: Optional[int] = None
+        self._ids: set[int] = set()
+
+    def add(self, event_id: int) -> bool:
+        """ Record an id, return False when it was delivered before """
+        if event_id in self._ids: return False
+        self._ids.add(event_id)
+        if self.highest is None or event_id > self.highest: self.highest = event_id
+        if len(self._ids) > 2 * self.lag:
+            self._ids = {seen for seen in self._ids if seen > self.highest - self.lag}
+        return True
+
+    def resume_after(self) -> Optional[int]:
+        """ Id to replay the journal after, far enough back to cover transactions still committing """
+        if self.highest is None: return None
+        return max(self.highest - self.lag, 0)
+
+
+class Subscription:
+    """ Bounded buffer of live events for one client, optionally of one project only """
+    def __init__(self, project_id: Optional[str] = None):
+        self.project_id = project_id
+        self.events: queue.Queue[dict[str, Any]] = queue.Queue(SUBSCRIBER_BUFFER)
+        self.overflowed = False
+
+    def offer(self, event: dict[str, Any]) -> None:
+        if self.project_id is not None and event["project_id"] != self.project_id: return
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventHub:
+    """ Fan out notifications received once per process to every subscriber """
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self._lock = Lock()
+
+    def subscribe(self, project_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(project_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict[str, Any]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+
+class EventListener(Thread):
+    """ Hold one LISTEN connection and feed its notifications into the hub, catching up from the journal after a reconnect """
+    def __init__(self, hub: EventHub, broker: Optional[RunEventsBroker] = None, retention: timedelta = timedelta(hours=24)):
+        super().__init__(name="event-listener", daemon=True)
+        self.hub = hub
+        self.broker = broker or RunEventsBroker()
+        self.retention = retention
+        self.delivered = DeliveredIds()
+        self.stopping = Event()
+        # LISTEN needs a dedicated connection for its lifetime, it is not borrowed from the pool
+        self.conninfo = make_url(settings.DB_RUNTIME_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def run(self) -> None:
+        backoff, next_prune = 1.0, time.monotonic()
+        while not self.stopping.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    backoff = 1.0
+                    self._catch_up()
+                    while not self.stopping.is_set():
+                        for notify in conn.notifies(timeout=KEEPALIVE_SECONDS):
+                            self._deliver(json.loads(notify.payload))
+                        if time.monotonic() >= next_prune:
+                            self.broker.prune(self.retention)
+                            next_prune = time.monotonic() + PRUNE_SECONDS
+            except psycopg.Error:
+                logger.exception("Event listener lost its connection, reconnecting in %.0fs", backoff)
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _catch_up(self) -> None:
+        """ Deliver events journaled while no connection was listening """
+        after = self.delivered.resume_after()
+        if after is None: return
+        while entries := self.broker.get_since(after):
+            for entry in entries:
+                self._deliver(event_dict(entry))
+            after = entries[-1].id
+
+    def _deliver(self, event: dict[str, Any]) -> None:
+        if not self.delivered.add(event["id"]): return
+        self.hub.publish(event)
+
+
+class EventServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], hub: EventHub, broker: Optional[RunEventsBroker] = None):
+        super().__init__(address, EventStreamHandler)
+        self.hub = hub
+        self.broker = broker or RunEventsBroker()
+
+
+class EventStreamHandler(BaseHTTPRequestHandler):
+    """
+    Server-Sent Events at `/events?project_id=...`.
+
+    With a Last-Event-ID header the journal is replayed from REPLAY_LAG ids before it, so events that
+    committed late are not lost. Clients may receive events they already have and de-duplicate by id.
+    """
+    server: EventServer
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/events":
+            self.send_error(404)
+            return
+
+        query = parse_qs(url.query)
+        try:
+            project_id = str(uuid.UUID(query["project_id"][0])) if "project_id" in query else None
+            last_id = self.headers.get("Last-Event-ID") or query.get("last_event_id", [None])[0]
+            last_id = int(last_id) if last_id is not None else None
+        except ValueError:
+            self.send_error(400)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        # subscribe before replaying, so nothing published in between is lost, duplicates are skipped by id
+        subscription = self.server.hub.subscribe(project_id)
+        delivered = DeliveredIds()
+        try:
+            if last_id is not None:
+                after = max(last_id - REPLAY_LAG, 0)
+                while entries := self.server.broker.get_since(after, project_id):
+                    for entry in entries:
+                        if delivered.add(entry.id): self._send(event_dict(entry))
+                    after = entries[-1].id
+            self._stream(subscription, delivered)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.hub.unsubscribe(subscription)
+
+    def _stream(self, subscription: Subscription, delivered: DeliveredIds) -> None:
+        while True:
+            try:
+                event = subscription.events.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                if subscription.overflowed: return
+                # comment lines keep proxies from timing out an idle stream
+                self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                continue
+            if not delivered.add(event["id"]): continue
+            self._send(event)
+            if subscription.overflowed and subscription.events.empty(): return
+
+    def _send(self, event: dict[str, Any]) -> None:
+        self.wfile.write(f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+    metrics.serve_configured()
+    hub = EventHub()
+    EventListener(hub, retention=timedelta(hours=settings.EVENTS_RETENTION_HOURS)).start()
+    server = EventServer((settings.EVENTS_HOST, settings.EVENTS_PORT), hub)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO, Union
+from app.core.config import settings
+import zstandard
+import tempfile
+import hashlib
+import mmap
+import os
+import re
+
+CHUNK_SIZE = 1 << 20
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ArtifactBackend(ABC):
+    """ Where compressed artifacts live, keyed by the SHA-256 of their uncompressed content """
+    @abstractmethod
+    def exists(self, digest: str) -> bool: ...
+
+    @abstractmethod
+    def put(self, digest: str, compressed: Path) -> None:
+        """ Take ownership of a compressed file staged on local disk """
+
+    @abstractmethod
+    def open(self, digest: str) -> BinaryIO:
+        """ Open the compressed artifact for reading """
+
+    @abstractmethod
+    def delete(self, digest: str) -> bool: ...
+
+    def staging_dir(self) -> Path:
+        """ Directory to stage compressed files in before `put` """
+        return Path(tempfile.gettempdir())
+
+
+class LocalArtifactBackend(ArtifactBackend):
+    """ Artifacts on local disk fanned out as <root>/ab/cd/<digest>.zst """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        if not DIGEST.match(digest): raise ValueError(f"Invalid artifact digest {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / f"{digest}.zst"
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def put(self, digest: str, compressed: Path) -> None:
+        path = self.path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # rename is atomic within one filesystem, readers never observe a partial artifact
+        os.replace(compressed, path)
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path(digest), "rb")
+
+    def delete(self, digest: str) -> bool:
+        try:
+            self.path(digest).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def staging_dir(self) -> Path:
+        # same filesystem as the artifacts, so `put` is a rename instead of a copy
+        staging = self.root / "staging"
+        staging.mkdir(parents=True, exist_ok=True)
+        return staging
+
+
+class ArtifactStore:
+    """ Content addressed, zstd compressed store for raw tool output """
+    def __init__(self, backend: ArtifactBackend, level: int = 3):
+        self.backend = backend
+        self.level = level
+
+    def put(self, content: Union[bytes, BinaryIO, Iterable[bytes]]) -> str:
+        """ Compress and store content streamed in chunks, return its SHA-256 digest, identical content is stored once """
+        if isinstance(content, bytes):
+            chunks: Iterable[bytes] = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+        elif hasattr(content, "read"):
+            chunks = iter(lambda: content.read(CHUNK_SIZE), b"")
+        else:
+            chunks = content
+
+        digest = hashlib.sha256()
+        fd, staged = tempfile.mkstemp(suffix=".zst", dir=self.backend.staging_dir())
+        try:
+            with os.fdopen(fd, "wb") as file:
+                with zstandard.ZstdCompressor(level=self.level).stream_writer(file, closefd=False) as writer:
+                    for chunk in chunks:
+                        digest.update(chunk)
+                        writer.write(chunk)
+
+            key = digest.hexdigest()
+            if not self.backend.exists(key):
+                self.backend.put(key, Path(staged))
+            return key
+        finally:
+            if os.path.exists(staged): os.unlink(staged)
+
+    def exists(self, digest: str) -> bool:
+        return self.backend.exists(digest)
+
+    def open(self, digest: str) -> BinaryIO:
+        """ Stream the decompressed artifact, close it when done """
+        return zstandard.ZstdDecompressor().stream_reader(self.backend.open(digest), closefd=True)
+
+    def open_mapped(self, digest: str) -> BinaryIO:
+        """ Stream the decompressed artifact from a memory map of the compressed file, for repeated or random access """
+        with self.backend.open(digest) as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return zstandard.ZstdDecompressor().stream_reader(mapped, closefd=True)
+
+    def read(self, digest: str) -> bytes:
+        """ Read the whole decompressed artifact, only for outputs known to be small """
+        with self.open(digest) as reader:
+            return reader.read()
+
+    def delete(self, digest: str) -> bool:
+        return self.backend.delete(digest)
+
+
+artifact_store = ArtifactStore(LocalArtifactBackend(settings.ARTIFACT_ROOT), settings.ARTIFACT_COMPRESSION_LEVEL)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,198 @@
+from collections.abc import Callable
+from typing import Optional
+from threading import Event, Thread
+from sqlalchemy import create_engine, pool
+from app.core.config import settings
+from app.core import metrics
+from app.db.models.runs import Runs
+from app.db.partitions import maintain_partitions
+from app.db.broker.runs import RunsBroker
+from app.domain.runs import RunOutputFormat, RunStatus
+import multiprocessing
+import subprocess
+import argparse
+import logging
+import socket
+import signal
+import shlex
+import time
+import os
+
+logger = logging.getLogger("app.worker")
+
+# executes a claimed run, returns its raw output and raises to fail the run
+# the event is set once the lease was lost, the handler should stop as another worker may own the run by then
+RunHandler = Callable[[Runs, Event], tuple[bytes, RunOutputFormat]]
+
+
+class LeaseLost(RuntimeError):
+    """ Raised by handlers that stopped because the worker lost the lease of their run """
+
+
+def command_handler(executable: str, timeout: float = 3600.0, poll_seconds: float = 1.0) -> RunHandler:
+    """ Handler running the raw command of a run without a shell, refusing commands that do not invoke executable """
+    def handler(run: Runs, lease_lost: Event) -> tuple[bytes, RunOutputFormat]:
+        argv = shlex.split(run.raw_command)
+        if not argv or argv[0] != executable:
+            raise PermissionError(f"Refuse to run {argv[0] if argv else 'an empty command'!r} for tool {executable!r}")
+
+        deadline = time.monotonic() + timeout
+        with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            while True:
+                try:
+                    stdout, stderr = process.communicate(timeout=poll_seconds)
+                    break
+                except subprocess.TimeoutExpired:
+                    if not lease_lost.is_set() and time.monotonic() < deadline: continue
+                    process.kill()
+                    process.communicate()
+                    if lease_lost.is_set(): raise LeaseLost(f"Run {run.id} lease was lost, {executable} was killed")
+                    raise subprocess.TimeoutExpired(argv, timeout)
+
+        if process.returncode != 0:
+            raise RuntimeError(f"exit status {process.returncode}: {stderr.decode('utf-8', 'replace')[-4096:]}")
+        return stdout, RunOutputFormat.TEXT
+    return handler
+
+
+def configured_handlers() -> dict[str, RunHandler]:
+    """ Handlers of the tools allowed by WORKER_COMMANDS, a tool is run by the executable of the same name """
+    tools = [tool.strip() for tool in settings.WORKER_COMMANDS.split(",") if tool.strip()]
+    return {tool: command_handler(tool, settings.WORKER_COMMAND_TIMEOUT) for tool in tools}
+
+
+class Worker:
+    """ Claim queued runs from the runs table and execute them, one run at a time """
+    def __init__(self, name: str, broker: Optional[RunsBroker] = None, handlers: Optional[dict[str, RunHandler]] = None,
+                 lease_seconds: float = 60, poll_seconds: float = 2.0, max_attempts: int = 3):
+        self.name = name
+        self.broker = broker or RunsBroker()
+        self.handlers = handlers or {}
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.stopping = Event()
+
+    def stop(self) -> None:
+        """ Finish the current run and exit the loop """
+        self.stopping.set()
+
+    def run_forever(self) -> None:
+        if not self.handlers: logger.warning("Worker %s has no handlers registered, it only reaps expired leases", self.name)
+        while not self.stopping.is_set():
+            self.reap()
+            # runs of tools without a handler stay queued for workers that have one
+            runs = self.broker.claim(self.name, self.lease_seconds, tools=list(self.handlers)) if self.handlers else []
+            if not runs:
+                self.stopping.wait(self.poll_seconds)
+                continue
+            self.process(runs[0])
+
+    def reap(self) -> None:
+        """ Fail and retry runs abandoned by crashed workers, any worker may do this """
+        with self.broker.unit_of_work():
+            for run in self.broker.reap_expired():
+                logger.warning("Run %s lease expired on attempt %d", run.id, run.attempt)
+                self._retry(run)
+
+    def process(self, run: Runs) -> None:
+        """ Execute a claimed run while heartbeating its lease, then complete or fail it """
+        done = Event()
+        lease_lost = Event()
+        heartbeat = Thread(target=self._heartbeat, args=(run, done, lease_lost), name=f"heartbeat-{run.id}", daemon=True)
+        heartbeat.start()
+        try:
+            handler = self.handlers.get(run.tool_name or "")
+            if handler is None: raise LookupError(f"No handler is registered for tool {run.tool_name!r}")
+            output, output_format = handler(run, lease_lost)
+        except Exception as e:
+            if lease_lost.is_set():
+                logger.warning("Run %s stopped after its lease was lost", run.id)
+                return
+            logger.exception("Run %s failed on attempt %d", run.id, run.attempt)
+            self._fail(run, f"{type(e).__name__}: {e}")
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+
+        # the run may belong to another worker by now, its output is discarded
+        if lease_lost.is_set():
+            logger.warning("Run %s lease was lost before completion", run.id)
+            return
+        with self.broker.unit_of_work():
+            if self.broker.release(run.id, self.name, RunStatus.COMPLETED) is None:
+                logger.warning("Run %s lease was lost before completion", run.id)
+                return
+            self.broker.attach_output(run.id, output, output_format)
+
+    def _heartbeat(self, run: Runs, done: Event, lease_lost: Event) -> None:
+        # renew well before expiry, so one slow round trip does not lose the lease
+        while not done.wait(self.lease_seconds / 3):
+            if not self.broker.heartbeat(run.id, self.name, self.lease_seconds):
+                logger.warning("Run %s lease was lost while running", run.id)
+                lease_lost.set()
+                return
+
+    def _fail(self, run: Runs, error: str) -> None:
+        with self.broker.unit_of_work():
+            failed = self.broker.release(run.id, self.name, RunStatus.FAILED, error)
+            if failed is not None: self._retry(failed)
+
+    def _retry(self, run: Runs) -> None:
+        if run.attempt >= self.max_attempts: return
+        retry = self.broker.retry(run)
+        logger.info("Run %s queued as attempt %d of %s", retry.id, retry.attempt, run.id)
+
+
+def worker_process(index: int) -> None:
+    """ Entry point of one worker process, stops gracefully on SIGTERM or SIGINT """
+    # every process has its own pools, the ports after the events server's one are the workers'
+    metrics.serve_configured(1 + index)
+    worker = Worker(
+        f"{socket.gethostname()}:{os.getpid()}:{index}",
+        handlers=configured_handlers(),
+        lease_seconds=settings.WORKER_LEASE_SECONDS,
+        poll_seconds=settings.WORKER_POLL_SECONDS,
+        max_attempts=settings.WORKER_MAX_ATTEMPTS,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Execute queued runs, start one per node and scale with --processes")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES, help="worker processes on this node")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    # spawned children build their own engine and pool, connections are never shared across a fork
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_process, args=(index,), name=f"worker-{index}") for index in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    # runs are only insertable while a partition holds the current month, partition DDL needs the migration role
+    partition_engine = create_engine(settings.DB_MIGRATE_URL, poolclass=pool.NullPool)
+    stopping = Event()
+    Thread(
+        target=maintain_partitions,
+        args=(partition_engine, settings.DB_PARTITION_MONTHS_AHEAD, settings.DB_PARTITION_CHECK_HOURS * 3600, stopping),
+        name="partition-maintenance",
+        daemon=True,
+    ).start()
+
+    def forward(*_):
+        for process in processes: process.terminate()
+
+    # children stop on their own on SIGINT from the terminal, SIGTERM is forwarded to them
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, forward)
+    for process in processes:
+        process.join()
+    stopping.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from flask import Flask, request, jsonify
 from .services.auth_service import login
 from .services.scan_service import start_scan
 from .services.report_service import generate_report
+from .sessions import require_session
+from .db import sessions
 
 app = Flask(__name__)
 
@@ -16,6 +18,7 @@ def api_login():
 
 
 @app.route("/api/scan", methods=["POST"])
+@require_session(sessions)
 def api_scan():
     data = request.json
     scan_id = start_scan(data["target_id"])
@@ -26,6 +29,7 @@ def api_scan():
 
 
 @app.route("/api/report/<scan_id>", methods=["GET"])
+@require_session(sessions)
 def api_report(scan_id):
     report = generate_report(scan_id)
     return jsonify(report)
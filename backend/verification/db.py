@@ -1,10 +1,16 @@
 from pathlib import Path
-from tinydb import TinyDB, Query
+from tinydb import Query
 from datetime import datetime
+from .storage import WriteBehindStorage
+from .indexes import IndexedTinyDB
+from .sessions import SessionStore
+from app.core.audit import AuditSink
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "data" / "database.json"
-db = TinyDB(DB_PATH)
+# inserts append to database.json.log in batches instead of rewriting database.json each time
+# tables look up scan_id, target_id and username through in-memory indexes, see indexes.py
+db = IndexedTinyDB(DB_PATH, storage=WriteBehindStorage)
 
 
 users = db.table("users")
@@ -15,6 +21,12 @@ reports = db.table("reports")
 audit_logs = db.table("audit_logs")
 metrics = db.table("metrics")
 
+# tokens are validated from memory, the table only lets sessions survive a restart
+sessions = SessionStore(ttl=3600, table=db.table("sessions"))
+
+# failed logins are queued and written in batches, a burst drops events instead of stalling logins
+audit = AuditSink(audit_logs.insert_multiple, name="verification")
+
 User = Query()
 Target = Query()
 Scan = Query()
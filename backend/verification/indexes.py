@@ -0,0 +1,120 @@
+from collections import defaultdict
+from threading import RLock
+from typing import Any, Dict, Iterable, List, Optional, Set
+from tinydb import TinyDB
+from tinydb.table import Document, Table
+
+# fields looked up by equality across the verification tables
+INDEXED_FIELDS = ("scan_id", "target_id", "username")
+
+
+class IndexedTable(Table):
+    """
+    TinyDB table keeping value -> document id maps for the indexed fields.
+
+    The maps are built from a single pass over the table on the first lookup and maintained by
+    every write made through the table afterwards, so lookups no longer scan the whole table.
+    """
+
+    indexed_fields = INDEXED_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index_lock = RLock()
+        self._indexes: Optional[Dict[str, Dict[Any, Set[int]]]] = None
+        self._indexed_values: Dict[int, Dict[str, Any]] = {}
+        # shared by every table of the storage, so writes from different threads do not overwrite each other
+        self._update_lock = getattr(self._storage, "update_lock", None) or RLock()
+
+    def find_by(self, field: str, value: Any) -> List[Document]:
+        """ Documents whose field equals value, in insertion order """
+        if field not in self.indexed_fields: raise KeyError(f"{field} is not indexed")
+        with self._index_lock:
+            doc_ids = sorted(self._build_indexes()[field].get(value, ()))
+        docs = [self.get(doc_id=doc_id) for doc_id in doc_ids]
+        return [doc for doc in docs if doc is not None]
+
+    def find_one_by(self, field: str, value: Any) -> Optional[Document]:
+        docs = self.find_by(field, value)
+        return docs[0] if docs else None
+
+    def insert(self, document) -> int:
+        doc_id = super().insert(document)
+        self._reindex([doc_id])
+        return doc_id
+
+    def insert_multiple(self, documents: Iterable) -> List[int]:
+        doc_ids = super().insert_multiple(documents)
+        self._reindex(doc_ids)
+        return doc_ids
+
+    def update(self, fields, cond=None, doc_ids=None) -> List[int]:
+        updated = super().update(fields, cond, doc_ids)
+        self._reindex(updated)
+        return updated
+
+    def update_multiple(self, updates) -> List[int]:
+        updated = super().update_multiple(updates)
+        self._reindex(updated)
+        return updated
+
+    def remove(self, cond=None, doc_ids=None) -> List[int]:
+        removed = super().remove(cond, doc_ids)
+        with self._index_lock:
+            if self._indexes is not None:
+                for doc_id in removed:
+                    self._unindex(doc_id)
+        return removed
+
+    def truncate(self) -> None:
+        super().truncate()
+        with self._index_lock:
+            self._indexes = None
+            self._indexed_values = {}
+
+    def _update_table(self, updater) -> None:
+        with self._update_lock:
+            # a write-behind storage logs only the documents the updater touched instead of diffing the database
+            update_table = getattr(self._storage, "update_table", None)
+            if update_table is None: return super()._update_table(updater)
+            update_table(self.name, updater, self.document_id_class)
+            self.clear_cache()
+
+    def _build_indexes(self) -> Dict[str, Dict[Any, Set[int]]]:
+        if self._indexes is None:
+            self._indexes = {field: defaultdict(set) for field in self.indexed_fields}
+            self._indexed_values = {}
+            for doc in self:
+                self._index(doc.doc_id, doc)
+        return self._indexes
+
+    def _reindex(self, doc_ids: Iterable[int]) -> None:
+        # upsert goes through update and insert, so it is covered by both
+        with self._index_lock:
+            if self._indexes is None: return
+            for doc_id in doc_ids:
+                self._unindex(doc_id)
+                doc = self.get(doc_id=doc_id)
+                if doc is not None: self._index(doc_id, doc)
+
+    def _index(self, doc_id: int, doc: Dict[str, Any]) -> None:
+        values = {field: doc[field] for field in self.indexed_fields if field in doc}
+        for field, value in values.items():
+            self._indexes[field][value].add(doc_id)
+        if values: self._indexed_values[doc_id] = values
+
+    def _unindex(self, doc_id: int) -> None:
+        for field, value in self._indexed_values.pop(doc_id, {}).items():
+            entries = self._indexes[field].get(value)
+            if entries is None: continue
+            entries.discard(doc_id)
+            if not entries: del self._indexes[field][value]
+
+
+class IndexedTinyDB(TinyDB):
+    """ TinyDB handing out tables with secondary indexes """
+    table_class = IndexedTable
+
+
+if __name__ == "__main__":
+    pass
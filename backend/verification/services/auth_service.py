@@ -1,18 +1,16 @@
-from uuid import uuid4
 from datetime import datetime
-from ..db import users, audit_logs, User
+from ..db import users, audit, sessions
 
 def login(username, password):
-    user = users.get(User.username == username)
+    user = users.find_one_by("username", username)
 
     if not user or user["password"] != password:
-        audit_logs.insert({
+        audit.emit({
             "event": "login_failed",
             "username": username,
             "time": datetime.utcnow().isoformat(),
         })
         return None
 
-    token = str(uuid4())
-    return token
+    return sessions.issue(user["username"])
 
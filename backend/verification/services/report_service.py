@@ -1,11 +1,8 @@
-from tinydb import Query
 from ..db import scans, findings
 
-Scan = Query()
-
 
 def generate_report(scan_id: str):
-    scan = scans.get(Scan.scan_id == scan_id)
+    scan = scans.find_one_by("scan_id", scan_id)
 
     if not scan:
         return {
@@ -13,7 +10,7 @@ def generate_report(scan_id: str):
             "scan_id": scan_id,
         }
 
-    scan_findings = findings.search(lambda f: f["scan_id"] == scan_id)
+    scan_findings = findings.find_by("scan_id", scan_id)
 
     return {
         "scan_id": scan_id,
@@ -0,0 +1,167 @@
+from functools import wraps
+from threading import Lock
+from typing import Dict, Optional, Set
+from flask import g, jsonify, request
+from tinydb.table import Table
+import hashlib
+import secrets
+import time
+
+
+def token_key(token: str) -> str:
+    """ Sessions are keyed by a digest of the token, so neither memory dumps nor the table hold usable tokens """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class Session:
+    """ Login session of one user, expiry is a wall clock timestamp so it survives a restart """
+    def __init__(self, key: str, username: str, expires_at: float, doc_id: Optional[int] = None):
+        self.key = key
+        self.username = username
+        self.expires_at = expires_at
+        self.doc_id = doc_id
+        self.stored_expires_at = expires_at
+
+
+class SessionStore:
+    """
+    Token sessions held in a hash map with sliding expiry and revocation.
+
+    Validation only touches memory. When a table is given, issued and revoked sessions are
+    written through to it and loaded back on start, sliding renewals are written at most every half ttl.
+    """
+
+    def __init__(self, ttl: float = 3600.0, sliding: bool = True, table: Optional[Table] = None, purge_every: int = 256):
+        self.ttl = ttl
+        self.sliding = sliding
+        self.table = table
+        self.purge_every = purge_every
+        self._issued = 0
+
+        self._lock = Lock()
+        self._sessions: Dict[str, Session] = {}
+        self._by_username: Dict[str, Set[str]] = {}
+        if table is not None: self._load()
+
+    def issue(self, username: str) -> str:
+        """ Start a session for username and return its bearer token """
+        token = secrets.token_urlsafe(32)
+        session = Session(token_key(token), username, time.time() + self.ttl)
+        if self.table is not None:
+            session.doc_id = self.table.insert({"key": session.key, "username": username, "expires_at": session.expires_at})
+        with self._lock:
+            self._add(session)
+            self._issued += 1
+            # abandoned tokens are never validated again, sweep them out every purge_every logins
+            purge = self._issued % self.purge_every == 0
+        if purge: self.purge_expired()
+        return token
+
+    def validate(self, token: str) -> Optional[Session]:
+        """ Session the token belongs to, or None when it is unknown, expired or revoked """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token_key(token))
+            if session is None: return None
+            expired = session.expires_at <= now
+            if expired:
+                self._discard(session)
+            elif self.sliding:
+                session.expires_at = now + self.ttl
+            # the stored expiry is only moved once it lags half a ttl behind, not on every request
+            stale = not expired and session.doc_id is not None and session.expires_at - session.stored_expires_at > self.ttl / 2
+            if stale: session.stored_expires_at = session.expires_at
+
+        if expired:
+            self._delete([session])
+            return None
+        if stale:
+            try:
+                self.table.update({"expires_at": session.expires_at}, doc_ids=[session.doc_id])
+            except KeyError:
+                # revoked by another request in the meantime
+                return None
+        return session
+
+    def revoke(self, token: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(token_key(token))
+            if session is not None: self._discard(session)
+        if session is None: return False
+        self._delete([session])
+        return True
+
+    def revoke_user(self, username: str) -> int:
+        """ Revoke every session of username, return how many were revoked """
+        with self._lock:
+            sessions = [self._sessions[key] for key in self._by_username.get(username, ())]
+            for session in sessions:
+                self._discard(session)
+        self._delete(sessions)
+        return len(sessions)
+
+    def sessions_of(self, username: str) -> list[Session]:
+        with self._lock:
+            return [self._sessions[key] for key in self._by_username.get(username, ())]
+
+    def purge_expired(self) -> int:
+        """ Drop expired sessions, return how many were dropped """
+        now = time.time()
+        with self._lock:
+            expired = [session for session in self._sessions.values() if session.expires_at <= now]
+            for session in expired:
+                self._discard(session)
+        self._delete(expired)
+        return len(expired)
+
+    def _add(self, session: Session) -> None:
+        self._sessions[session.key] = session
+        self._by_username.setdefault(session.username, set()).add(session.key)
+
+    def _discard(self, session: Session) -> None:
+        self._sessions.pop(session.key, None)
+        keys = self._by_username.get(session.username)
+        if keys is None: return
+        keys.discard(session.key)
+        if not keys: del self._by_username[session.username]
+
+    def _delete(self, sessions: list[Session]) -> None:
+        doc_ids = [session.doc_id for session in sessions if session.doc_id is not None]
+        if self.table is not None and doc_ids: self.table.remove(doc_ids=doc_ids)
+
+    def _load(self) -> None:
+        now = time.time()
+        expired = []
+        for doc in self.table:
+            if doc["expires_at"] <= now:
+                expired.append(doc.doc_id)
+                continue
+            self._add(Session(doc["key"], doc["username"], doc["expires_at"], doc.doc_id))
+        if expired: self.table.remove(doc_ids=expired)
+
+
+def bearer_token() -> Optional[str]:
+    """ Token of the current request, the Authorization header may carry it bare or as a Bearer credential """
+    header = request.headers.get("Authorization", "").strip()
+    scheme, _, credentials = header.partition(" ")
+    if scheme.lower() == "bearer": return credentials.strip() or None
+    return header or None
+
+
+def require_session(store: SessionStore):
+    """ Reject requests without a valid session token, the session is exposed as `g.session` """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token()
+            session = store.validate(token) if token else None
+            if session is None:
+                return jsonify({"error": "Unauthorized"}), 401
+            g.session = session
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    pass
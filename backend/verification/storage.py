@@ -0,0 +1,221 @@
+from collections.abc import Callable, Mapping, MutableMapping
+from pathlib import Path
+from threading import Lock, RLock, Thread, Event
+from typing import Any, Dict, Optional
+from tinydb.storages import Storage
+import atexit
+import json
+import os
+
+
+def copied(value: Any) -> Any:
+    """ Copy of a JSON value down to its nested lists and dicts, so callers never share objects with the stored data """
+    if isinstance(value, dict): return {key: copied(item) for key, item in value.items()}
+    if isinstance(value, list): return [copied(item) for item in value]
+    return value
+
+
+class TableView(Mapping):
+    """ Read only view of a stored table, documents are copied as they are looked up """
+    def __init__(self, docs: Dict[str, Any]):
+        self.docs = docs
+
+    def __getitem__(self, doc_id: str) -> Any:
+        return copied(self.docs[doc_id])
+
+    def __iter__(self):
+        # the table may change while it is iterated, a list of its keys is taken in one step
+        return iter(list(self.docs))
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def items(self):
+        return ((doc_id, copied(doc)) for doc_id, doc in list(self.docs.items()))
+
+
+class TableChanges(MutableMapping):
+    """
+    Documents of one table as handed to a TinyDB table updater, recording what it touched.
+
+    A document is copied on first access, so changes to nested values are seen and an updater failing
+    halfway leaves the stored data as it was. Only touched documents are compared and logged afterwards.
+    """
+    def __init__(self, docs: Dict[str, Any], document_id_class: type):
+        self.docs = docs
+        self.document_id_class = document_id_class
+        # str doc id -> document, or None once removed
+        self.changed: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def __getitem__(self, doc_id) -> Dict[str, Any]:
+        key = str(doc_id)
+        if key not in self.changed: self.changed[key] = copied(self.docs[key])
+        doc = self.changed[key]
+        if doc is None: raise KeyError(doc_id)
+        return doc
+
+    def __setitem__(self, doc_id, doc: Dict[str, Any]) -> None:
+        self.changed[str(doc_id)] = copied(doc)
+
+    def __delitem__(self, doc_id) -> None:
+        if doc_id not in self: raise KeyError(doc_id)
+        self.changed[str(doc_id)] = None
+
+    def __contains__(self, doc_id) -> bool:
+        key = str(doc_id)
+        if key in self.changed: return self.changed[key] is not None
+        return key in self.docs
+
+    def __iter__(self):
+        for key in list(self.docs):
+            if self.changed.get(key, True) is not None: yield self.document_id_class(key)
+        for key, doc in list(self.changed.items()):
+            if key not in self.docs and doc is not None: yield self.document_id_class(key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def clear(self) -> None:
+        for key in list(self.docs) + list(self.changed):
+            self.changed[key] = None
+
+
+class WriteBehindStorage(Storage):
+    """
+    TinyDB storage that appends changed documents to a log instead of rewriting the whole file.
+
+    The JSON snapshot at `path` stays readable by the default storage, changes since the last
+    compaction live in `<path>.log` as one JSON record per line and are replayed on open.
+    """
+
+    def __init__(self, path, flush_interval: float = 1.0, flush_size: int = 256, compact_size: int = 4 << 20):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + ".log")
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.compact_size = compact_size
+
+        self._lock = Lock()
+        # TinyDB reads, changes and writes back the whole database per operation, tables hold this across all three
+        self.update_lock = RLock()
+        self._pending: list[str] = []
+        self._data = self._load()
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self._closed = Event()
+        self._flusher = Thread(target=self._flush_periodically, name="tinydb-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            if not self._data: return None
+            # lookups by document id do not copy the whole database
+            return {table: TableView(docs) for table, docs in self._data.items()}
+
+    def write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """ Whole database writes, compared document by document, tables of an `IndexedTinyDB` go through update_table """
+        with self._lock:
+            for table in self._data.keys() - data.keys():
+                self._pending.append(json.dumps({"table": table, "drop": True}))
+            for table, docs in data.items():
+                current = self._data.get(table, {})
+                if isinstance(docs, TableView):
+                    # tables TinyDB did not touch are handed back as they were read
+                    data[table] = docs.docs
+                    continue
+                for doc_id in current.keys() - docs.keys():
+                    self._pending.append(json.dumps({"table": table, "id": doc_id, "doc": None}))
+                for doc_id, doc in docs.items():
+                    if current.get(doc_id) != doc:
+                        self._pending.append(json.dumps({"table": table, "id": doc_id, "doc": doc}))
+            self._data = data
+            if len(self._pending) >= self.flush_size: self._flush()
+
+    def update_table(self, table: str, updater: Callable[[MutableMapping], None], document_id_class: type = int) -> None:
+        """ Apply a TinyDB table updater, only the documents it touched are compared and logged """
+        with self.update_lock:
+            changes = TableChanges(self._data.get(table, {}), document_id_class)
+            updater(changes)
+            with self._lock:
+                # tables are never replaced here, readers iterate them through a snapshot of their keys
+                docs = self._data.setdefault(table, {})
+                for doc_id, doc in changes.changed.items():
+                    if doc is None:
+                        if docs.pop(doc_id, None) is None: continue
+                    elif docs.get(doc_id) == doc:
+                        continue
+                    else:
+                        docs[doc_id] = doc
+                    self._pending.append(json.dumps({"table": table, "id": doc_id, "doc": doc}))
+                if len(self._pending) >= self.flush_size: self._flush()
+
+    def flush(self) -> None:
+        """ Durably append pending changes to the log """
+        with self._lock:
+            self._flush()
+
+    def compact(self) -> None:
+        """ Rewrite the snapshot from memory and empty the log """
+        with self._lock:
+            self._flush()
+            self._compact()
+
+    def close(self) -> None:
+        if self._closed.is_set(): return
+        self._closed.set()
+        with self._lock:
+            self._flush()
+            if self._log.tell() >= self.compact_size: self._compact()
+            self._log.close()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        data = json.loads(self.path.read_text(encoding="utf-8") or "{}") if self.path.exists() else {}
+        if not self.log_path.exists(): return data
+
+        good = 0
+        with open(self.log_path, "rb") as log:
+            for line in log:
+                try:
+                    # a record is only complete with its line feed, appends are not atomic
+                    if not line.endswith(b"\n"): raise ValueError
+                    record = json.loads(line)
+                except ValueError:
+                    # a crash mid append leaves at most the last record torn
+                    break
+                good += len(line)
+                if record.get("drop"):
+                    data.pop(record["table"], None)
+                elif record["doc"] is None:
+                    data.get(record["table"], {}).pop(record["id"], None)
+                else:
+                    data.setdefault(record["table"], {})[record["id"]] = record["doc"]
+        # cut the torn record off, records appended after it would otherwise be glued to it and lost on the next open
+        if good < self.log_path.stat().st_size: os.truncate(self.log_path, good)
+        return data
+
+    def _flush(self) -> None:
+        if not self._pending or self._log.closed: return
+        self._log.write("\n".join(self._pending) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._pending.clear()
+        if self._log.tell() >= self.compact_size: self._compact()
+
+    def _compact(self) -> None:
+        staged = self.path.with_name(self.path.name + ".tmp")
+        with open(staged, "w", encoding="utf-8") as snapshot:
+            json.dump(self._data, snapshot)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        # the snapshot is replaced atomically before the log is emptied, a crash in between only replays the log twice
+        os.replace(staged, self.path)
+        self._log.truncate(0)
+        self._log.seek(0)
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+
+if __name__ == "__main__":
+    pass
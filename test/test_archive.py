@@ -0,0 +1,40 @@
+import json
+import sys
+import uuid
+import pytest
+from datetime import datetime, timezone
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("zstandard")
+
+try:
+    from app.core.config import settings
+    from app.db.archive import MANIFEST, ARCHIVED_TABLES, archive_dir, rehydrate_project
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+
+
+def write_manifest(project_id, months):
+    tables = {table.name: {"rows": 0, "sha256": "", "months": []} for table in ARCHIVED_TABLES}
+    tables["runs"]["months"] = months
+    tables["findings"]["months"] = months
+    source = archive_dir(project_id)
+    source.mkdir(parents=True)
+    (source / MANIFEST).write_text(json.dumps({"project_id": str(project_id), "tables": tables}))
+    return source
+
+
+def test_rehydrate_refuses_rows_past_the_retention_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_ROOT", tmp_path)
+    project_id = uuid.uuid4()
+    source = write_manifest(project_id, ["2024-12-01", "2025-01-01"])
+
+    # nothing may touch the database, retention would drop the recreated partitions again
+    with pytest.raises(ValueError, match="2024-12-01"):
+        rehydrate_project(None, project_id, retention_months=18, now=datetime(2026, 7, 15, tzinfo=timezone.utc))
+    assert (source / MANIFEST).exists()
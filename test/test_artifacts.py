@@ -0,0 +1,55 @@
+import hashlib
+import io
+import sys
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("zstandard")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.storage.artifacts import ArtifactStore, LocalArtifactBackend, CHUNK_SIZE
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(LocalArtifactBackend(tmp_path / "artifacts"))
+
+
+def test_artifacts_round_trip_by_digest(store, tmp_path):
+    # spans several chunks, so streaming compression sees more than one write
+    content = b"PORT   STATE SERVICE\n22/tcp open  ssh\n" * (CHUNK_SIZE // 16)
+    digest = store.put(content)
+
+    assert digest == hashlib.sha256(content).hexdigest()
+    stored = tmp_path / "artifacts" / digest[:2] / digest[2:4] / f"{digest}.zst"
+    assert stored.read_bytes()[:4] == b"\x28\xb5\x2f\xfd" and stored.stat().st_size < len(content)
+
+    assert store.read(digest) == content
+    with store.open_mapped(digest) as reader:
+        assert reader.read() == content
+
+
+def test_identical_content_is_stored_once(store, tmp_path):
+    content = b"<nmaprun scanner=\"nmap\"></nmaprun>"
+    digest = store.put(content)
+
+    # streams and chunk iterables of the same bytes address the same artifact
+    assert store.put(io.BytesIO(content)) == digest
+    assert store.put([content[:10], content[10:]]) == digest
+    assert len(list((tmp_path / "artifacts").rglob("*.zst"))) == 1
+    # staged files of deduplicated puts are cleaned up
+    assert not list((tmp_path / "artifacts" / "staging").iterdir())
+
+    assert store.delete(digest) and not store.exists(digest)
+    assert not store.delete(digest)
+
+
+def test_invalid_digests_are_refused(store):
+    with pytest.raises(ValueError):
+        store.exists("../../etc/passwd")
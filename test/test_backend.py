@@ -81,7 +81,7 @@ def test_scan_and_report_flow(client):
     scan_id = scan_data["scan_id"]
 
     # ---- retrieve report ----
-    report_resp = client.get(f"/api/report/{scan_id}")
+    report_resp = client.get(f"/api/report/{scan_id}", headers={"Authorization": token})
 
     assert report_resp.status_code == 200
 
@@ -99,3 +99,199 @@ def test_scan_and_report_flow(client):
         assert "confidence" in finding
         assert 0.0 <= finding["confidence"] <= 1.0
 
+
+
+def test_write_behind_storage_replays_log(tmp_path):
+    from tinydb import TinyDB
+    from verification.storage import WriteBehindStorage
+
+    path = tmp_path / "database.json"
+    db = TinyDB(path, storage=WriteBehindStorage, flush_interval=60)
+    scans = db.table("scans")
+    scan_id = scans.insert({"scan_id": "scan-1", "status": "running"})
+    scans.insert({"scan_id": "scan-2", "status": "running"})
+    scans.update({"status": "completed"}, doc_ids=[scan_id])
+    scans.remove(doc_ids=[2])
+    db.close()
+
+    # nothing was compacted, every change lives in the log only
+    assert not path.exists()
+
+    reopened = TinyDB(path, storage=WriteBehindStorage)
+    assert reopened.table("scans").all() == [{"scan_id": "scan-1", "status": "completed"}]
+    reopened.close()
+
+
+def test_write_behind_storage_compacts(tmp_path):
+    from tinydb import TinyDB
+    from verification.storage import WriteBehindStorage
+
+    path = tmp_path / "database.json"
+    db = TinyDB(path, storage=WriteBehindStorage, flush_size=1, compact_size=1)
+    db.table("findings").insert({"title": "SQL Injection", "severity": "critical"})
+
+    assert json.loads(path.read_text()) == {"findings": {"1": {"title": "SQL Injection", "severity": "critical"}}}
+    assert (tmp_path / "database.json.log").stat().st_size == 0
+    db.close()
+
+
+def test_indexed_table_stays_in_sync(tmp_path):
+    from verification.indexes import IndexedTinyDB
+    from verification.storage import WriteBehindStorage
+
+    db = IndexedTinyDB(tmp_path / "database.json", storage=WriteBehindStorage)
+    findings = db.table("findings")
+    findings.insert({"scan_id": "scan-1", "title": "SQL Injection"})
+    assert [f["title"] for f in findings.find_by("scan_id", "scan-1")] == ["SQL Injection"]
+
+    # writes after the first lookup maintain the index instead of rebuilding it
+    findings.insert_multiple([{"scan_id": "scan-1", "title": "Reflected XSS"}, {"scan_id": "scan-2", "title": "Open Redirect"}])
+    findings.update({"scan_id": "scan-2"}, doc_ids=[1])
+    findings.remove(doc_ids=[2])
+    findings.upsert({"scan_id": "scan-3", "title": "Missing CSP Header"}, lambda f: f["title"] == "Missing CSP Header")
+
+    assert findings.find_by("scan_id", "scan-1") == []
+    assert [f["title"] for f in findings.find_by("scan_id", "scan-2")] == ["SQL Injection", "Open Redirect"]
+    assert findings.find_one_by("scan_id", "scan-3")["title"] == "Missing CSP Header"
+    db.close()
+
+
+def test_write_behind_storage_logs_nested_changes_of_touched_documents(tmp_path):
+    from verification.indexes import IndexedTinyDB
+    from verification.storage import WriteBehindStorage
+
+    path = tmp_path / "database.json"
+    log = tmp_path / "database.json.log"
+    db = IndexedTinyDB(path, storage=WriteBehindStorage, flush_interval=60)
+    scans = db.table("scans")
+    scans.insert_multiple({"scan_id": f"scan-{i}", "ports": [22]} for i in range(100))
+    db.storage.flush()
+    logged = len(log.read_text().splitlines())
+
+    # a nested value changed in place is seen, and only the touched document is logged
+    scans.update(lambda doc: doc["ports"].append(443), doc_ids=[5])
+    db.storage.flush()
+    assert len(log.read_text().splitlines()) == logged + 1
+
+    # documents handed out do not share nested values with the stored data
+    scans.get(doc_id=6)["ports"].append(8080)
+    assert scans.get(doc_id=6)["ports"] == [22]
+    db.close()
+
+    reopened = IndexedTinyDB(path, storage=WriteBehindStorage)
+    assert reopened.table("scans").get(doc_id=5)["ports"] == [22, 443]
+    reopened.close()
+
+
+def test_scan_requires_session(client):
+    resp = client.post("/api/scan", json={"target_id": "tgt-001"})
+    assert resp.status_code == 401
+
+    resp = client.post("/api/scan", json={"target_id": "tgt-001"}, headers={"Authorization": "Bearer not-a-token"})
+    assert resp.status_code == 401
+
+
+def test_report_requires_session(client):
+    resp = client.get("/api/report/scan-001")
+    assert resp.status_code == 401
+
+    resp = client.get("/api/report/scan-001", headers={"Authorization": "Bearer not-a-token"})
+    assert resp.status_code == 401
+
+
+def test_session_store_expiry_and_revocation(tmp_path, monkeypatch):
+    from verification.indexes import IndexedTinyDB
+    from verification.sessions import SessionStore
+    from verification.storage import WriteBehindStorage
+
+    now = [1000.0]
+    monkeypatch.setattr("verification.sessions.time.time", lambda: now[0])
+
+    db = IndexedTinyDB(tmp_path / "database.json", storage=WriteBehindStorage)
+    store = SessionStore(ttl=60, table=db.table("sessions"))
+    token = store.issue("operator")
+    other = store.issue("operator")
+
+    # every validation slides the expiry forward
+    now[0] += 50
+    assert store.validate(token).username == "operator"
+    now[0] += 50
+    assert store.validate(token) is not None
+    assert store.validate(other) is None
+
+    # sessions are reloaded from the table, the expired one was removed from it
+    reloaded = SessionStore(ttl=60, table=db.table("sessions"))
+    assert len(reloaded.sessions_of("operator")) == 1
+    assert reloaded.revoke_user("operator") == 1
+    assert reloaded.validate(token) is None
+    assert len(db.table("sessions")) == 0
+    db.close()
+
+
+def test_failed_login_is_audited(client):
+    from verification.db import audit, audit_logs
+
+    before = len(audit_logs)
+    client.post("/api/login", json={"username": "nobody", "password": "wrongpassword"})
+    audit.flush()
+
+    assert len(audit_logs) == before + 1
+    assert audit_logs.all()[-1]["username"] == "nobody"
+
+
+def test_audit_sink_drops_beyond_capacity():
+    from threading import Event
+    from app.core.audit import AuditSink
+
+    written, release = [], Event()
+    def write(batch):
+        release.wait(5)
+        written.extend(batch)
+
+    sink = AuditSink(write, capacity=2, flush_interval=0.01)
+    results = [sink.emit({"n": n}) for n in range(10)]
+    release.set()
+    sink.close()
+
+    # the writer may hold one batch while the queue fills, everything beyond is dropped
+    assert results[:2] == [True, True] and not all(results)
+    assert sink.counters()["dropped"] == results.count(False)
+    assert [event["n"] for event in written] == [n for n, queued in enumerate(results) if queued]
+
+
+def test_write_behind_storage_recovers_torn_log(tmp_path):
+    from tinydb import TinyDB
+    from verification.storage import WriteBehindStorage
+
+    path = tmp_path / "database.json"
+    db = TinyDB(path, storage=WriteBehindStorage)
+    db.table("scans").insert({"scan_id": "scan-1"})
+    db.close()
+
+    # crash in the middle of appending a record
+    with open(tmp_path / "database.json.log", "a") as log:
+        log.write('{"table": "scans", "id": "2", "doc": {"scan_')
+
+    db = TinyDB(path, storage=WriteBehindStorage)
+    db.table("scans").insert({"scan_id": "scan-2"})
+    db.close()
+
+    reopened = TinyDB(path, storage=WriteBehindStorage)
+    assert [scan["scan_id"] for scan in reopened.table("scans").all()] == ["scan-1", "scan-2"]
+    reopened.close()
+
+
+def test_session_store_purges_abandoned_sessions(monkeypatch):
+    from verification.sessions import SessionStore
+
+    now = [1000.0]
+    monkeypatch.setattr("verification.sessions.time.time", lambda: now[0])
+
+    store = SessionStore(ttl=60, purge_every=2)
+    store.issue("operator")
+    now[0] += 120
+    store.issue("analyst")
+
+    # the first session was never validated again, the second login swept it out
+    assert store.sessions_of("operator") == []
+    assert len(store.sessions_of("analyst")) == 1
@@ -0,0 +1,119 @@
+import json
+import sys
+import uuid
+import pytest
+from contextlib import contextmanager
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.db.models import Findings, RunEvents
+    from app.db.broker import base
+    from app.db.broker.base import BaseBroker, returning_entries
+    from app.domain.findings import FindingSeverity, FindingType
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql
+
+
+
+def returned_columns(stmt):
+    compiled = str(stmt.compile(dialect=postgresql.dialect()))
+    return [column.strip().rsplit(".", 1)[-1] for column in compiled.split(" RETURNING ")[1].split(",")]
+
+
+def test_writes_do_not_return_deferred_columns():
+    inserted = returned_columns(returning_entries(insert(Findings).values(title="SQL Injection"), Findings))
+    updated = returned_columns(returning_entries(update(Findings).where(Findings.id.is_(None)).values(title="XSS"), Findings))
+
+    # the search vector may be as large as the finding itself
+    assert "search_vector" not in inserted and "search_vector" not in updated
+    assert inserted == updated and {"id", "created_at", "content", "run_id"} <= set(inserted)
+
+
+class RecordingCopy:
+    def __init__(self):
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class RecordingSession:
+    """ Session and driver connection standing in for get_session, records COPY rows and multi-row INSERT parameters """
+    def __init__(self):
+        self.copies = []
+        self.inserted = []
+        self.driver_connection = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def connection(self):
+        # session.connection().connection.driver_connection resolves to the recording session itself
+        return type("Connection", (), {"connection": self})()
+
+    def cursor(self):
+        return self
+
+    def copy(self, statement):
+        self.copies.append(RecordingCopy())
+        return self.copies[-1]
+
+    def scalars(self, stmt, rows):
+        self.inserted.extend(rows)
+        keys = list(range(1, len(rows) + 1))
+        return type("Result", (), {"all": lambda _: keys})()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    recording = RecordingSession()
+    monkeypatch.setattr(base, "get_session", contextmanager(lambda: (yield recording)))
+    return recording
+
+
+def test_bulk_creation_past_the_threshold_copies_with_client_side_keys(session):
+    run_id = uuid.uuid4()
+    rows = [{"run_id": run_id, "finding_type": FindingType.VULNERABILITY, "severity": FindingSeverity.HIGH,
+             "title": f"finding {index}", "content": "", "evidence": ""} for index in range(BaseBroker.copy_threshold)]
+
+    keys = BaseBroker(Findings).create_bulk(rows)
+    (copy,) = session.copies
+    assert len(copy.rows) == len(keys) == BaseBroker.copy_threshold and not session.inserted
+    # uuid7 keys are time ordered and unique, enum columns receive the member name
+    assert all(isinstance(key, uuid.UUID) and key.version == 7 for key in keys) and len(set(keys)) == len(keys)
+    assert [row[-1] for row in copy.rows] == keys
+    assert copy.rows[0][:3] == [run_id, "VULNERABILITY", "HIGH"]
+
+
+def test_bulk_creation_of_identity_keys_stays_on_insert(session):
+    rows = [{"event": "status", "payload": {"status": "running"}, "project_id": uuid.uuid4(), "run_id": uuid.uuid4()}
+            for _ in range(BaseBroker.copy_threshold)]
+
+    # COPY cannot report the keys the sequence assigns
+    assert BaseBroker(RunEvents).create_bulk(rows) == list(range(1, BaseBroker.copy_threshold + 1))
+    assert not session.copies and len(session.inserted) == BaseBroker.copy_threshold
+
+
+def test_copy_leaves_identity_columns_out_and_encodes_json():
+    rows = [{"id": 1, "event": "findings", "payload": {"count": 2, "severity": "high"}, "project_id": uuid.uuid4(), "run_id": uuid.uuid4()}]
+    columns = base.copy_columns(RunEvents, rows, RunEvents.__table__.c.id)
+
+    assert [column.name for column in columns] == ["event", "payload", "project_id", "run_id"]
+    assert json.loads(base.copy_values(rows[0], columns)[1]) == {"count": 2, "severity": "high"}
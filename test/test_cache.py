@@ -0,0 +1,53 @@
+import sys
+import uuid
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.db.cache import EntityCache
+    from app.db.models import Users, Runs, Findings, Reports, FindingFingerprints
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy.orm import make_transient_to_detached
+
+
+
+def detached_user(user_id, email):
+    user = Users(id=user_id, email=email, hashed_password="", is_verified=False)
+    make_transient_to_detached(user)
+    return user
+
+
+def test_put_refuses_entities_read_before_an_invalidation():
+    cache = EntityCache()
+    user_id = uuid.uuid4()
+
+    token = cache.token()
+    # a writer commits and invalidates between the read and the put
+    cache.invalidate(Users, user_id)
+    cache.put(detached_user(user_id, "old@example.com"), token=token)
+    assert cache.get(Users, user_id) is None
+
+    cache.put(detached_user(user_id, "new@example.com"), token=cache.token())
+    assert cache.get(Users, user_id).email == "new@example.com"
+
+    token = cache.token()
+    cache.invalidate_model(Users)
+    cache.put(detached_user(user_id, "old@example.com"), token=token)
+    assert cache.get(Users, user_id) is None
+
+
+def test_deleting_runs_invalidates_trigger_cascaded_models(monkeypatch):
+    cache = EntityCache()
+    invalidated = []
+    monkeypatch.setattr(cache, "invalidate_model", invalidated.append)
+
+    cache.invalidate_dependents(Runs)
+    # findings and reports reference runs without a foreign key, fingerprints hang off findings
+    assert {Findings, Reports, FindingFingerprints} <= set(invalidated)
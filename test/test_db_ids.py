@@ -0,0 +1,60 @@
+import sys
+import time
+import uuid
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core.config import settings
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import create_engine, text
+from app.core.debug import connection_check
+from app.db.ids import uuid7, uuid7_time
+
+if not connection_check(settings.DB_RUNTIME_URL):
+    pytest.skip("database is not reachable", allow_module_level=True)
+
+
+
+@pytest.fixture(scope="module")
+def connection():
+    engine = create_engine(settings.DB_RUNTIME_URL)
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+def generate_v7(connection):
+    return connection.scalar(text(f"SELECT {settings.DB_SCHEMA}.uuid_generate_v7()"))
+
+
+def test_sql_uuid7_layout_matches_python(connection):
+    value = generate_v7(connection)
+    now = connection.scalar(text("SELECT clock_timestamp()"))
+
+    assert value.version == uuid7().version == 7
+    assert value.variant == uuid7().variant == uuid.RFC_4122
+    # both embed unix milliseconds in the leading 48 bits
+    assert abs((uuid7_time(value) - now).total_seconds()) < 1
+
+
+def test_sql_and_python_uuid7_interleave_in_creation_order(connection):
+    values = []
+    for _ in range(5):
+        values.append(uuid7())
+        time.sleep(0.01)
+        values.append(generate_v7(connection))
+        time.sleep(0.01)
+
+    # keys made on either side of the database sort by creation time, in Python and in PostgreSQL alike,
+    # as long as the test host and the database share a clock
+    assert sorted(values) == values
+    ordered = connection.scalars(text("SELECT id FROM unnest(CAST(:ids AS uuid[])) AS id ORDER BY id"), {"ids": values[::-1]}).all()
+    assert ordered == values
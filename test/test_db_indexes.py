@@ -0,0 +1,72 @@
+import json
+import sys
+import uuid
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core.config import settings
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import create_engine, text
+from app.core.debug import connection_check
+
+if not connection_check(settings.DB_RUNTIME_URL):
+    pytest.skip("database is not reachable", allow_module_level=True)
+
+
+
+@pytest.fixture(scope="module")
+def connection():
+    engine = create_engine(settings.DB_RUNTIME_URL)
+    with engine.connect() as conn:
+        # tables are small in testing, keep the planner from preferring a sequential scan
+        conn.execute(text("SET enable_seqscan = off"))
+        conn.execute(text(f"SET search_path = {settings.DB_SCHEMA}"))
+        yield conn
+    engine.dispose()
+
+
+def index_names(plan):
+    """ Collect every index referenced by a JSON query plan node and its children """
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def parent_indexes(connection, names):
+    """ Resolve indexes on partitions to the partitioned index they were created from """
+    query = text(
+        "SELECT parent.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE child.relname = ANY(:names)"
+    )
+    return set(names) | set(connection.scalars(query, {"names": list(names)}))
+
+
+@pytest.mark.parametrize("query, index", [
+    ("SELECT * FROM projects WHERE owner_id = :id", "ix_projects_owner_id"),
+    ("SELECT * FROM targets WHERE project_id = :id ORDER BY created_at DESC, id DESC LIMIT 50", "ix_targets_project_id_created_at_id"),
+    ("SELECT * FROM targets WHERE network >>= inet '10.2.3.4'", "ix_targets_network"),
+    ("SELECT * FROM runs WHERE project_id = :id AND status = 'RUNNING' ORDER BY created_at DESC", "ix_runs_project_id_status_created_at"),
+    ("SELECT * FROM runs WHERE target_id = :id", "ix_runs_target_id"),
+    ("SELECT id FROM runs WHERE status = 'QUEUED' ORDER BY priority, created_at LIMIT 10 FOR UPDATE SKIP LOCKED", "ix_runs_queue"),
+    ("SELECT * FROM findings WHERE run_id = :id AND severity = 'CRITICAL'", "ix_findings_run_id_severity"),
+    ("SELECT * FROM findings WHERE run_id = :id ORDER BY created_at DESC, id DESC LIMIT 50", "ix_findings_run_id_created_at_id"),
+    ("SELECT * FROM reports WHERE run_id = :id", "ix_reports_run_id"),
+    ("SELECT * FROM findings WHERE search_vector @@ websearch_to_tsquery('english', 'sql injection')", "ix_findings_search_vector"),
+])
+def test_query_uses_index(connection, query, index):
+    result = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), {"id": uuid.uuid4()})
+    plan = result.scalar_one()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    assert index in parent_indexes(connection, index_names(plan[0]["Plan"]))
@@ -0,0 +1,104 @@
+import http.client
+import json
+import sys
+import uuid
+import pytest
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Thread
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app import events
+    from app.db.models import RunEvents
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+
+
+PROJECT_ID = uuid.uuid4()
+
+
+class JournalBroker:
+    """ Stands in for RunEventsBroker, serving a fixed journal in small pages """
+    def __init__(self, ids, page=2):
+        self.page = page
+        self.entries = [journaled(event_id) for event_id in ids]
+        self.queries = []
+
+    def get_since(self, after, project_id=None, limit=1000):
+        self.queries.append(after)
+        return [entry for entry in self.entries if entry.id > after][:self.page]
+
+
+def journaled(event_id):
+    return RunEvents(id=event_id, created_at=datetime(2026, 10, 18, tzinfo=timezone.utc), event="status",
+                     payload={"status": "running"}, project_id=PROJECT_ID, run_id=uuid.uuid4())
+
+
+def test_delivered_ids_skip_repeats_but_not_late_commits():
+    delivered = events.DeliveredIds(lag=4)
+    assert delivered.resume_after() is None
+
+    assert delivered.add(10) and not delivered.add(10)
+    # a transaction holding a lower id committed after 10 was delivered
+    assert delivered.add(8) and not delivered.add(8)
+    assert delivered.highest == 10 and delivered.resume_after() == 6
+
+    # ids fall out once they are more than lag behind the highest, memory stays bounded
+    for event_id in range(11, 30):
+        delivered.add(event_id)
+    assert len(delivered._ids) <= 2 * delivered.lag and not delivered.add(29)
+
+
+def test_listener_catches_up_from_before_the_last_delivered_id():
+    broker = JournalBroker([3, 4, 5, 6, 7])
+    hub = events.EventHub()
+    subscription = hub.subscribe()
+    listener = events.EventListener(hub, broker)
+    listener.delivered = events.DeliveredIds(lag=3)
+    for event_id in (3, 5, 6):
+        listener.delivered.add(event_id)
+
+    listener._catch_up()
+    # 4 committed late and 7 while disconnected, the others were delivered before
+    assert [subscription.events.get_nowait()["id"] for _ in range(2)] == [4, 7]
+    assert subscription.events.empty() and broker.queries[0] == 3
+
+
+def test_stream_replays_journal_then_live_events_once(monkeypatch):
+    monkeypatch.setattr(events, "REPLAY_LAG", 2)
+    hub, broker = events.EventHub(), JournalBroker([1, 2, 3, 4, 5])
+    server = events.EventServer(("127.0.0.1", 0), hub, broker)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request("GET", f"/events?project_id={PROJECT_ID}", headers={"Last-Event-ID": "5"})
+        response = connection.getresponse()
+        assert response.status == 200 and response.getheader("Content-Type") == "text/event-stream"
+
+        def read_event():
+            lines = []
+            while (line := response.fp.readline().decode("utf-8")) != "\n":
+                lines.append(line.rstrip("\n"))
+            return lines
+
+        first = read_event()
+        assert first[:2] == ["id: 4", "event: status"]
+        assert json.loads(first[2].removeprefix("data: "))["project_id"] == str(PROJECT_ID)
+        assert read_event()[0] == "id: 5"
+
+        # the replay subscribed first, a live copy of a replayed event is skipped
+        hub.publish(events.event_dict(journaled(5)))
+        hub.publish({**events.event_dict(journaled(6)), "project_id": str(uuid.uuid4())})
+        hub.publish(events.event_dict(journaled(7)))
+        assert read_event()[0] == "id: 7"
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+import sys
+import uuid
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core.config import settings
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import create_engine, text
+from app.core.debug import connection_check
+
+if not connection_check(settings.DB_RUNTIME_URL):
+    pytest.skip("database is not reachable", allow_module_level=True)
+
+from app.db.broker.findings import FindingsBroker
+from app.db.broker.runs import RunsBroker
+from app.db.models import FindingFingerprints
+from app.db.session import get_session
+from app.domain.findings import FindingSeverity, FindingType
+
+
+
+@pytest.fixture(scope="module")
+def project_id():
+    engine = create_engine(settings.DB_RUNTIME_URL)
+    schema = settings.DB_SCHEMA
+    with engine.begin() as conn:
+        owner_id = conn.scalar(text(f"INSERT INTO {schema}.users (email, hashed_password) VALUES (:email, '') RETURNING id"), {"email": f"{uuid.uuid4()}@example.com"})
+        project_id = conn.scalar(text(f"INSERT INTO {schema}.projects (name, owner_id) VALUES ('findings test', :owner) RETURNING id"), {"owner": owner_id})
+    yield project_id
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {schema}.users WHERE id = :id"), {"id": owner_id})
+    engine.dispose()
+
+
+def finding(run_id, evidence):
+    return {
+        "run_id": run_id,
+        "finding_type": FindingType.VULNERABILITY,
+        "severity": FindingSeverity.HIGH,
+        "title": "SQL Injection",
+        "content": "login form concatenates the username into the query",
+        "evidence": evidence,
+    }
+
+
+def test_upsert_inserts_once_and_counts_repeats(project_id):
+    runs, findings = RunsBroker(), FindingsBroker()
+    first = runs.create({"project_id": project_id, "tool_name": "sqlmap", "raw_command": "sqlmap -u http://10.0.0.5/login"})
+    second = runs.create({"project_id": project_id, "tool_name": "sqlmap", "raw_command": "sqlmap -u http://10.0.0.5/login"})
+
+    finding_id, inserted = findings.upsert(finding(first.id, "' OR 1=1 --"), "10.0.0.5")
+    assert inserted
+    # a later run reporting the same issue updates the fingerprint row, xmax is set on the new row version
+    repeat_id, inserted = findings.upsert(finding(second.id, "' OR 1=1 --"), "10.0.0.5")
+    assert not inserted and repeat_id == finding_id
+
+    # the finding itself was written once, by the first run
+    [entry] = findings.get_bulk({"id": finding_id})
+    assert entry.run_id == first.id
+    assert [other.id for other in findings.get_bulk({"fingerprint": entry.fingerprint})] == [finding_id]
+
+    with get_session() as session:
+        tracked = session.get(FindingFingerprints, (project_id, entry.fingerprint))
+        assert tracked.occurrences == 2 and tracked.last_run_id == second.id and tracked.finding_id == finding_id
+
+    # other evidence is another finding
+    other_id, inserted = findings.upsert(finding(second.id, "admin'--"), "10.0.0.5")
+    assert inserted and other_id != finding_id
@@ -0,0 +1,24 @@
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+from app.db.ids import uuid7, uuid7_time
+
+
+
+def test_uuid7_layout():
+    value = uuid7()
+
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert abs((uuid7_time(value) - datetime.now(timezone.utc)).total_seconds()) < 5
+
+
+def test_uuid7_is_monotonic():
+    values = [uuid7() for _ in range(10000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
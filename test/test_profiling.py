@@ -0,0 +1,47 @@
+import sys
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.db.profiling import StatementProfiler
+
+
+
+def test_profiler_never_fails_statements():
+    engine = create_engine("sqlite://")
+    # every statement counts as slow, and sqlite answers EXPLAIN with bytecode rows the profiler cannot render
+    profiler = StatementProfiler(engine, "test", slow_threshold=0.0, explain=True)
+    profiler.enable()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar_one() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing"))
+
+        # the failed statement left no start time behind to pair with the next one
+        assert conn.info["query_start"] == []
+        conn.execute(text("SELECT 2"))
+
+    assert sum(row["count"] for row in profiler.snapshot()) == 2
+    profiler.disable()
+
+
+def test_profiler_evicts_least_recently_executed_statements():
+    engine = create_engine("sqlite://")
+    profiler = StatementProfiler(engine, "test", slow_threshold=60.0, max_statements=2)
+    profiler.enable()
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 1 AS one"))
+        conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 1 AS two"))
+
+    # SELECT 1 and SELECT 2 share one shape, it was executed again after SELECT 1 AS one
+    assert sorted(row["statement"] for row in profiler.snapshot()) == ["SELECT ?", "SELECT ? AS two"]
+    profiler.disable()
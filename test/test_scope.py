@@ -0,0 +1,44 @@
+import sys
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+from app.domain.target import ScopeSet, merge_scopes
+
+
+
+def test_merge_overlapping_and_adjacent_scopes():
+    merged = merge_scopes(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.7", "10.0.0.128/25", "192.168.1.9/24"])
+
+    assert [str(network) for network in merged] == ["10.0.0.0/23", "192.168.1.0/24"]
+
+
+def test_merge_keeps_ip_versions_apart():
+    merged = merge_scopes(["::/96", "0.0.0.0/8", "2001:db8::1"])
+
+    assert [str(network) for network in merged] == ["0.0.0.0/8", "::/96", "2001:db8::1/128"]
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("10.2.3.4", True),
+    ("10.2.255.255", True),
+    ("10.3.0.0", False),
+    ("10.2.0.0/16", True),
+    ("10.2.0.0/15", False),
+    ("172.16.0.1", True),
+    ("172.16.0.2", False),
+    ("fd00::1", False),
+])
+def test_scope_containment(address, expected):
+    scope = ScopeSet(["10.2.0.0/17", "10.2.128.0/17", "172.16.0.1"])
+
+    assert (address in scope) is expected
+
+
+def test_scope_overlap():
+    scope = ScopeSet(["10.0.0.0/16", "2001:db8::/48"])
+
+    assert scope.overlaps(ScopeSet(["10.0.255.0/24"]))
+    assert scope.overlaps(ScopeSet(["2001:db8:0:1::/64"]))
+    assert not scope.overlaps(ScopeSet(["10.1.0.0/16", "2001:db9::/48"]))
@@ -0,0 +1,62 @@
+import sys
+import time
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("argon2")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core import security
+except Exception:
+    pytest.skip("settings are not configured", allow_module_level=True)
+
+from argon2 import PasswordHasher
+
+
+
+def test_verify_runs_in_pool():
+    hashed = security.hash_password("redteam")
+
+    assert security.verify_password("redteam", hashed)
+    assert not security.verify_password("wrongpassword", hashed)
+    assert not security.verify_password("redteam", "not a hash")
+
+
+def test_outdated_hash_is_upgraded():
+    outdated = PasswordHasher(time_cost=1, memory_cost=1024, parallelism=1).hash("redteam")
+
+    valid, upgraded = security.verify_and_upgrade("redteam", outdated)
+    assert valid
+    assert not security.hasher.check_needs_rehash(upgraded)
+
+    assert security.verify_and_upgrade("redteam", upgraded) == (True, None)
+    assert security.verify_and_upgrade("wrongpassword", outdated) == (False, None)
+
+
+def test_pool_fails_fast_at_capacity():
+    pool = security.HashingPool(workers=1, queue_limit=0, timeout=10)
+    pool._slots.acquire()
+
+    with pytest.raises(security.HasherBusy):
+        pool.run(security.hash_in_worker, security.parameters(), "redteam")
+    pool.shutdown()
+
+
+def test_timed_out_work_keeps_its_slot():
+    pool = security.HashingPool(workers=1, queue_limit=0, timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        pool.run(time.sleep, 1.0)
+    # the sleep still occupies the only worker, so nothing else is let in
+    with pytest.raises(security.HasherBusy):
+        pool.run(time.sleep, 0)
+
+    # the slot frees up once the sleep finished in the worker
+    deadline = time.monotonic() + 10
+    while pool._slots._value == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.run(time.sleep, 0) is None
+    pool.shutdown()
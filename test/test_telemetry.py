@@ -0,0 +1,59 @@
+import sys
+import pytest
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core import metrics
+    from app.db.telemetry import PoolTelemetry, TimedQueuePool, render_pools
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_exhausted_pool_accounts_waits_and_timeouts(engine):
+    telemetry = PoolTelemetry(engine, "test")
+
+    with engine.connect():
+        # the only connection is checked out, the next checkout blocks until pool_timeout
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    wait = telemetry.snapshot()["checkout_wait"]
+    assert wait["count"] == 2 and wait["sum"] >= 0.05
+    assert telemetry.snapshot()["checkout_timeouts"] == 1
+
+    # a disposed engine recreates its pool, which keeps reporting to the same telemetry
+    engine.dispose()
+    with engine.connect(): pass
+    assert telemetry.snapshot()["checkout_wait"]["count"] == 3
+
+
+def test_render_pools_groups_metric_families(engine):
+    telemetry = PoolTelemetry(engine, "test")
+    with engine.connect(): pass
+
+    lines = render_pools([telemetry]).splitlines()
+    assert 'db_pool_checkout_wait_seconds_count{pool="test"} 1' in lines
+    assert 'db_pool_checkouts_total{pool="test"} 1' in lines
+    assert 'db_pool_size{pool="test"} 1' in lines
+    assert lines.count("# TYPE db_pool_connects_total counter") == 1
+
+
+def test_metrics_server_is_off_unless_configured(monkeypatch):
+    monkeypatch.setattr(metrics.settings, "METRICS_PORT", 0)
+    assert metrics.serve_configured() is None
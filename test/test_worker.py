@@ -0,0 +1,118 @@
+import sys
+import time
+import uuid
+import pytest
+from contextlib import nullcontext
+from pathlib import Path
+
+# add <repo_root>/backend to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+
+try:
+    from app.core.config import settings
+    from app.db.models import Runs
+    from app.worker import Worker, command_handler
+except Exception:
+    pytest.skip("database settings are not configured", allow_module_level=True)
+
+from sqlalchemy import create_engine, text
+from app.core.debug import connection_check
+from app.domain.runs import RunOutputFormat, RunPurpose, RunStatus
+
+
+
+class RecordingBroker:
+    """ Stands in for RunsBroker, holding the lease as long as `leased` """
+    def __init__(self, leased=True):
+        self.leased = leased
+        self.calls = []
+
+    def unit_of_work(self):
+        return nullcontext()
+
+    def heartbeat(self, run_id, worker, lease_seconds):
+        return self.leased
+
+    def release(self, run_id, worker, status, error=None):
+        self.calls.append(("release", status, error))
+        return Runs(id=run_id, attempt=3)
+
+    def attach_output(self, run_id, output, output_format):
+        self.calls.append(("attach_output", output, output_format))
+
+
+def queued_run(tool_name, raw_command):
+    return Runs(id=uuid.uuid4(), tool_name=tool_name, raw_command=raw_command, attempt=1)
+
+
+def test_worker_runs_registered_handlers_only():
+    broker = RecordingBroker()
+    worker = Worker("worker-1", broker=broker, handlers={"echo": lambda run, lease_lost: (b"done", RunOutputFormat.TEXT)})
+
+    worker.process(queued_run("echo", "echo done"))
+    assert broker.calls == [("release", RunStatus.COMPLETED, None), ("attach_output", b"done", RunOutputFormat.TEXT)]
+
+    # the raw command of a run with no registered tool is never executed
+    broker.calls.clear()
+    worker.process(queued_run("sh", "sh -c 'touch pwned'"))
+    assert broker.calls == [("release", RunStatus.FAILED, "LookupError: No handler is registered for tool 'sh'")]
+
+
+def test_command_handler_refuses_other_executables():
+    handler = command_handler("nmap")
+    with pytest.raises(PermissionError):
+        handler(queued_run("nmap", "sh -c 'nmap -sV 10.0.0.1'"), None)
+
+
+def test_lost_lease_stops_the_handler_and_discards_its_output():
+    broker = RecordingBroker(leased=False)
+    worker = Worker("worker-1", broker=broker, handlers={"sleep": command_handler("sleep", poll_seconds=0.01)}, lease_seconds=0.03)
+
+    started = time.monotonic()
+    worker.process(queued_run("sleep", "sleep 5"))
+    # the command was killed once the heartbeat failed, and nothing was recorded for a run another worker may own
+    assert time.monotonic() - started < 2
+    assert broker.calls == []
+
+
+@pytest.fixture(scope="module")
+def project_id():
+    if not connection_check(settings.DB_RUNTIME_URL): pytest.skip("database is not reachable")
+    engine = create_engine(settings.DB_RUNTIME_URL)
+    schema = settings.DB_SCHEMA
+    with engine.begin() as conn:
+        owner_id = conn.scalar(text(f"INSERT INTO {schema}.users (email, hashed_password) VALUES (:email, '') RETURNING id"), {"email": f"{uuid.uuid4()}@example.com"})
+        project_id = conn.scalar(text(f"INSERT INTO {schema}.projects (name, owner_id) VALUES ('worker test', :owner) RETURNING id"), {"owner": owner_id})
+    yield project_id
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {schema}.users WHERE id = :id"), {"id": owner_id})
+    engine.dispose()
+
+
+def test_claim_reap_and_retry(project_id):
+    from app.db.broker.runs import RunsBroker
+
+    broker = RunsBroker()
+    tool = f"tool-{uuid.uuid4().hex[:8]}"
+    enrichment = broker.create({"project_id": project_id, "tool_name": tool, "raw_command": tool, "purpose": RunPurpose.ENRICHMENT})
+    primary = broker.create({"project_id": project_id, "tool_name": tool, "raw_command": tool, "purpose": RunPurpose.PRIMARY})
+
+    # highest priority first, and only runs of the tools asked for
+    assert broker.claim("worker-1", 60, tools=["other"]) == []
+    [claimed] = broker.claim("worker-1", 60, tools=[tool])
+    assert claimed.id == primary.id and claimed.status == RunStatus.RUNNING and claimed.lease_owner == "worker-1"
+    assert not broker.heartbeat(claimed.id, "worker-2", 60)
+
+    # an expired lease is failed by whoever reaps, and retried as a new run pointing back at it
+    [claimed] = broker.claim("worker-2", -1, tools=[tool])
+    assert claimed.id == enrichment.id
+    [reaped] = [run for run in broker.reap_expired() if run.id == enrichment.id]
+    assert reaped.id == enrichment.id and reaped.status == RunStatus.FAILED and reaped.last_error == "lease expired"
+    assert broker.release(enrichment.id, "worker-2", RunStatus.COMPLETED) is None
+
+    retry = broker.retry(reaped)
+    assert retry.purpose == RunPurpose.RETRY and retry.retry_of == enrichment.id and retry.attempt == 2 and retry.status == RunStatus.QUEUED
+    [claimed] = broker.claim("worker-1", 60, tools=[tool])
+    assert claimed.id == retry.id